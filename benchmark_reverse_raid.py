@@ -0,0 +1,233 @@
+"""Benchmark voor de verplaats-pijplijn van de Reverse RAID 0 Simulator.
+
+Genereert synthetische bronmappen (aantal bestanden, grootteverdeling, leeftijdsspreiding
+en botsingen met de doelmap), draait een echte verplaatscyclus met Discord naar een lokale
+stub en rapporteert bestanden/s, MB/s, tijd per fase en piek-RSS. Met --json wordt het
+resultaat machine-leesbaar weggeschreven; met --vergelijk wordt het tegen een eerder
+resultaat afgezet.
+
+Voorbeeld:
+    python benchmark_reverse_raid.py --bestanden 20000 --bronmappen 4 --json resultaat.json
+    python benchmark_reverse_raid.py --bron-mounts /mnt/disk1 /mnt/disk2 --doel-mount /dev/shm
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import reverse_raid
+
+class DiscordStub(BaseHTTPRequestHandler):
+    """Lokale stand-in voor een Discord webhook die alles met 204 beantwoordt."""
+
+    berichten = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        DiscordStub.berichten += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def start_discord_stub():
+    """Start de webhook stub op een vrije poort en geef de URL terug."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DiscordStub)
+    threading.Thread(target=server.serve_forever, name='discord-stub', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/webhook"
+
+def kies_grootte(rng, min_grootte, max_grootte):
+    """Kies een bestandsgrootte log-uniform tussen min en max, zodat kleine en grote bestanden beide voorkomen."""
+    if max_grootte <= min_grootte:
+        return min_grootte
+    laag = max(1, min_grootte)
+    return int(min(max_grootte, laag * (max_grootte / laag) ** rng.random()))
+
+def genereer_bronmappen(args, werkmap):
+    """Maak de synthetische bronmappen en doelmap aan. Geeft (bronmappen, doelmap, statistiek) terug."""
+    rng = random.Random(args.seed)
+    bron_basissen = args.bron_mounts or [werkmap]
+    bronmappen = []
+    for i in range(args.bronmappen):
+        basis = bron_basissen[i % len(bron_basissen)]
+        bronmappen.append(tempfile.mkdtemp(prefix=f'bron{i+1}-', dir=basis))
+    doelmap = tempfile.mkdtemp(prefix='doel-', dir=args.doel_mount or werkmap)
+
+    nu = time.time()
+    blok = os.urandom(1024 * 1024)
+    statistiek = {'bestanden': 0, 'bytes': 0, 'te_nieuw': 0, 'botsingen': 0}
+    for nummer in range(args.bestanden):
+        bronmap = bronmappen[nummer % len(bronmappen)]
+        naam = f"bestand_{nummer:08d}.bin"
+        pad = os.path.join(bronmap, naam)
+        grootte = kies_grootte(rng, args.min_grootte, args.max_grootte)
+        with open(pad, 'wb') as f:
+            resterend = grootte
+            while resterend > 0:
+                deel = blok[:min(resterend, len(blok))]
+                f.write(deel)
+                resterend -= len(deel)
+
+        # Verdeel de leeftijden over [0, spreiding]; een deel valt daardoor onder de minimale leeftijd
+        leeftijd_uren = rng.random() * args.leeftijd_spreiding_uren
+        mtime = nu - leeftijd_uren * 3600
+        os.utime(pad, (mtime, mtime))
+        if leeftijd_uren < args.minimum_leeftijd_uren:
+            statistiek['te_nieuw'] += 1
+        elif rng.random() < args.botsingen:
+            open(os.path.join(doelmap, naam), 'wb').close()
+            statistiek['botsingen'] += 1
+        statistiek['bestanden'] += 1
+        statistiek['bytes'] += grootte
+    return bronmappen, doelmap, statistiek
+
+def piek_rss_mb():
+    """Geef het piekgeheugen van dit proces in MB (ru_maxrss is in KB op Linux, in bytes op macOS)."""
+    piek = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return piek / (1024 * 1024) if sys.platform == 'darwin' else piek / 1024
+
+def draai_benchmark(args):
+    """Genereer een boom, draai één verplaatscyclus en geef de resultaten als dict terug."""
+    werkmap = tempfile.mkdtemp(prefix='reverseraid-benchmark-')
+    server, webhook_url = start_discord_stub()
+    oude_map = os.getcwd()
+    bronmappen, doelmap = [], None
+    try:
+        generatie_begin = time.perf_counter()
+        bronmappen, doelmap, boom = genereer_bronmappen(args, werkmap)
+        generatie_duur = time.perf_counter() - generatie_begin
+
+        config = reverse_raid.maak_standaard_configuratie()
+        config.update({
+            'aantal_mappen': len(bronmappen),
+            'source_paths': bronmappen,
+            'destination_path': doelmap,
+            'minimum_leeftijd_uren': args.minimum_leeftijd_uren,
+            'discord_webhook_url': webhook_url,
+            'max_verplaatsingen_totaal': args.workers_totaal,
+            'max_verplaatsingen_per_schijf': args.workers_per_schijf,
+            'scan_index': not args.zonder_index
+        })
+
+        # Index en journaal komen naast het (denkbeeldige) configuratiebestand in de werkmap
+        os.chdir(werkmap)
+        toestand = reverse_raid.maak_toestand(config)
+
+        stdout = sys.stdout
+        if not args.toon_log:
+            sys.stdout = open(os.devnull, 'w')
+        try:
+            resultaat = reverse_raid.verplaats_bestanden(config, toestand=toestand)
+            reverse_raid.stop_discord_notifiers(timeout=10)
+            reverse_raid.leeg_logboek()
+        finally:
+            if not args.toon_log:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+        duur = resultaat['duur']
+        return {
+            'parameters': {sleutel: waarde for sleutel, waarde in vars(args).items() if sleutel not in ('json', 'vergelijk', 'toon_log')},
+            'boom': boom,
+            'generatie_seconden': generatie_duur,
+            'cyclus': resultaat,
+            'bestanden_per_seconde': resultaat['verplaatst'] / duur if duur > 0 else 0.0,
+            'mb_per_seconde': resultaat['bytes'] / (1024 * 1024) / duur if duur > 0 else 0.0,
+            'discord_posts': DiscordStub.berichten,
+            'piek_rss_mb': piek_rss_mb()
+        }
+    finally:
+        os.chdir(oude_map)
+        server.shutdown()
+        if not args.bewaar:
+            # Bron- en doelmappen op andere mounts staan buiten de werkmap en worden apart opgeruimd
+            for pad in bronmappen + [doelmap, werkmap]:
+                if pad:
+                    shutil.rmtree(pad, ignore_errors=True)
+
+def toon_resultaat(uitkomst, vorige=None):
+    """Print een leesbare samenvatting, optioneel met het verschil ten opzichte van een vorige run."""
+    cyclus = uitkomst['cyclus']
+    regels = [
+        ("bestanden/s", uitkomst['bestanden_per_seconde']),
+        ("MB/s", uitkomst['mb_per_seconde']),
+        ("cyclusduur (s)", cyclus['duur']),
+        ("scan (s)", cyclus['fasen']['scan']),
+        ("beslis (s)", cyclus['fasen']['beslis']),
+        ("wachten op workers (s)", cyclus['fasen']['wachten']),
+        ("verplaats (s)", cyclus['fasen']['verplaats']),
+        ("log (s)", cyclus['fasen']['log']),
+        ("piek RSS (MB)", uitkomst['piek_rss_mb'])
+    ]
+    vorige_waarden = {}
+    if vorige:
+        vorige_cyclus = vorige['cyclus']
+        vorige_waarden = {
+            "bestanden/s": vorige['bestanden_per_seconde'],
+            "MB/s": vorige['mb_per_seconde'],
+            "cyclusduur (s)": vorige_cyclus['duur'],
+            "scan (s)": vorige_cyclus['fasen']['scan'],
+            "beslis (s)": vorige_cyclus['fasen']['beslis'],
+            "wachten op workers (s)": vorige_cyclus['fasen'].get('wachten', 0.0),
+            "verplaats (s)": vorige_cyclus['fasen']['verplaats'],
+            "log (s)": vorige_cyclus['fasen']['log'],
+            "piek RSS (MB)": vorige['piek_rss_mb']
+        }
+
+    print(f"Boom: {uitkomst['boom']['bestanden']} bestanden, {uitkomst['boom']['bytes'] / (1024 * 1024):.1f} MB, "
+          f"{uitkomst['boom']['te_nieuw']} te nieuw, {uitkomst['boom']['botsingen']} botsingen")
+    print(f"Cyclus: {cyclus['verplaatst']} van {cyclus['bestanden']} verplaatst, {uitkomst['discord_posts']} Discord posts")
+    for naam, waarde in regels:
+        regel = f"  {naam:<24} {waarde:12.4f}"
+        if naam in vorige_waarden and vorige_waarden[naam]:
+            verschil = (waarde - vorige_waarden[naam]) / vorige_waarden[naam] * 100
+            regel += f"   ({verschil:+.1f}% t.o.v. vorige)"
+        print(regel)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de verplaats-pijplijn met een synthetische bronboom.")
+    parser.add_argument('--bestanden', type=int, default=10000, help="Aantal te genereren bestanden")
+    parser.add_argument('--bronmappen', type=int, default=4, help="Aantal bronmappen")
+    parser.add_argument('--min-grootte', type=int, default=0, help="Minimale bestandsgrootte in bytes")
+    parser.add_argument('--max-grootte', type=int, default=64 * 1024, help="Maximale bestandsgrootte in bytes")
+    parser.add_argument('--leeftijd-spreiding-uren', type=float, default=24.0, help="Leeftijden worden verdeeld over 0 tot dit aantal uren")
+    parser.add_argument('--minimum-leeftijd-uren', type=float, default=12.0, help="minimum_leeftijd_uren voor de cyclus")
+    parser.add_argument('--botsingen', type=float, default=0.1, help="Fractie van de oude bestanden die al in de doelmap staat")
+    parser.add_argument('--bron-mounts', nargs='*', help="Mappen (bijvoorbeeld verschillende schijven) waarover de bronmappen worden verdeeld")
+    parser.add_argument('--doel-mount', help="Map waarin de doelmap wordt aangemaakt (bijvoorbeeld /dev/shm voor tmpfs)")
+    parser.add_argument('--workers-totaal', type=int, default=4, help="max_verplaatsingen_totaal")
+    parser.add_argument('--workers-per-schijf', type=int, default=1, help="max_verplaatsingen_per_schijf")
+    parser.add_argument('--zonder-index', action='store_true', help="Draai zonder scan index")
+    parser.add_argument('--seed', type=int, default=1, help="Seed voor de willekeurige boom")
+    parser.add_argument('--toon-log', action='store_true', help="Toon de logregels van de cyclus")
+    parser.add_argument('--bewaar', action='store_true', help="Laat de gegenereerde werkmap staan")
+    parser.add_argument('--json', help="Schrijf het resultaat als JSON naar dit bestand ('-' voor stdout)")
+    parser.add_argument('--vergelijk', help="Vergelijk met een eerder JSON resultaat")
+    args = parser.parse_args()
+
+    uitkomst = draai_benchmark(args)
+
+    vorige = None
+    if args.vergelijk:
+        with open(args.vergelijk, 'r', encoding='utf-8') as f:
+            vorige = json.load(f)
+
+    if args.json == '-':
+        json.dump(uitkomst, sys.stdout, indent=2)
+        print()
+    else:
+        toon_resultaat(uitkomst, vorige)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(uitkomst, f, indent=2)
+
+if __name__ == "__main__":
+    main()
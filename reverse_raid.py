@@ -1,10 +1,28 @@
+import time
+
+# Moment waarop het proces begon, vóór de zwaardere imports; basis voor de koude-start meting
+PROCES_START = time.monotonic()
+
 import os
+import errno
 import shutil
+import stat
 import yaml
 import sys
-import time
+import signal
+import argparse
 import json
-import requests
+import queue
+import heapq
+import hashlib
+import bisect
+import collections
+import select
+import sqlite3
+import struct
+import threading
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -16,21 +34,218 @@ def maak_standaard_configuratie():
         'destination_path': '',      # Leeg doelpad
         'minimum_leeftijd_uren': 12, # Standaard minimum leeftijd in uren
         'uitvoer_interval_minuten': 10,  # Standaard interval in minuten
-        'console_wissen_interval_uren': 6,  # Standaard console wissen interval in uren
-        'discord_webhook_url': ''    # Discord webhook URL
+        'discord_webhook_url': '',   # Discord webhook URL
+        'max_verplaatsingen_totaal': 4,      # Maximaal aantal gelijktijdige verplaatsingen
+        'max_verplaatsingen_per_schijf': 1,  # Maximaal aantal gelijktijdige verplaatsingen per bronschijf
+        'watch_modus': False,                # Bronmappen bewaken met inotify in plaats van vast interval
+        'watch_poll_interval_seconden': 5,   # Poll interval als inotify niet beschikbaar is
+        'scan_index': True,                  # Beslissingen per bestand bewaren in een index naast het configuratiebestand
+        'discord_wachtrij_grootte': 1000,    # Maximaal aantal Discord berichten in de wachtrij
+        'discord_timeout_seconden': 10,      # Timeout voor een Discord webhook aanroep
+        'metrics_bestand': 'reverseraid.prom',  # Prometheus tekstbestand met metrics per cyclus (relatief aan de configuratiemap, leeg = uit)
+        'metrics_poort': 0,                  # Lokale HTTP poort voor /metrics (0 = uit)
+        'extra_destination_paths': [],       # Extra doelmappen naast destination_path
+        'plaatsingsbeleid': 'meeste_vrije_ruimte',  # meeste_vrije_ruimte, round_robin of gewogen_doorvoer
+        'minimale_vrije_ruimte_mb': 1024,    # Vrije ruimte die op elke doelmap vrij moet blijven
+        'deduplicatie': False,               # Bij een naambotsing de inhoud vergelijken en echte duplicaten uit de bron verwijderen
+        'conflict_afhandeling': 'overslaan', # overslaan, hernoemen of quarantaine bij een botsing met andere inhoud
+        'quarantaine_map': '',               # Map voor conflicterende bestanden bij conflict_afhandeling quarantaine
+        'hash_budget_mb_per_cyclus': 1024,   # Maximaal aantal MB dat per cyclus wordt gehasht
+        'recursief': False,                  # Ook submappen van de bronmappen doorlopen (relatief pad blijft behouden)
+        'max_diepte': 0,                     # Maximale diepte onder een bronmap bij recursief scannen (0 = onbeperkt)
+        'max_scan_threads': 8,               # Maximaal aantal mappen dat tegelijk wordt gescand
+        'lege_mappen_opruimen': False,       # Submappen verwijderen die na het verplaatsen leeg zijn
+        'cyclus_max_minuten': 0,             # Maximale duur van een cyclus; de rest schuift door (0 = onbeperkt)
+        'cyclus_max_gb': 0,                  # Maximaal aantal GB per cyclus; de rest schuift door (0 = onbeperkt)
+        'verwerkingsvolgorde': 'scan',       # scan, oudste_eerst, grootste_eerst of kleinste_eerst
+        'bandbreedte_mb_per_seconde': 0,     # Globale kopieersnelheid tussen schijven (0 = onbeperkt)
+        'bandbreedte_per_bronmap_mb_per_seconde': 0,  # Kopieersnelheid per bronmap (0 = onbeperkt)
+        'bandbreedte_per_doelmap_mb_per_seconde': 0,  # Kopieersnelheid per doelmap (0 = onbeperkt)
+        'bandbreedte_schema': [],            # Globale snelheid per tijdvak, bijv. {van: '07:00', tot: '23:00', mb_per_seconde: 20}
+        'log_bestand': 'reverseraid.log',    # Logbestand met één JSON regel per bericht (relatief aan de configuratiemap, leeg = uit)
+        'log_max_mb': 10,                    # Grootte waarbij het logbestand wordt geroteerd
+        'log_bewaar_aantal': 3,              # Aantal geroteerde logbestanden dat wordt bewaard
+        'log_niveau': 'info',                # Minimaal niveau voor het logbestand (debug = ook regels per bestand)
+        'console_niveau': 'info',            # Minimaal niveau voor de console (debug = ook regels per bestand)
+        'console_samenvatting_seconden': 10, # Regels per bestand worden hooguit zo vaak samengevat in de console
+        'coordinatie': False,                # Werk verdelen met andere instanties via leases onder destination_path
+        'instantie_id': '',                  # Naam van deze instantie (leeg = host-pid); geeft ook een eigen journaal en scan index
+        'lease_seconden': 60,                # Een instantie zonder vernieuwde lease geldt daarna als gestopt
+        'coordinatie_verdeling': 'bestanden', # bestanden (hash van de naam) of bronmappen
+        'stabiel_seconden': 0,               # Grootte en mtime moeten zo lang gelijk blijven vóór het verplaatsen (0 = uit)
+        'open_bestanden_controleren': False  # Een bestand dat geen proces open heeft (/proc/*/fd) geldt als stabiel
     }
     return standaard_config
 
+# Verwachte types en minimale waarden per configuratieveld
+CONFIG_SCHEMA = {
+    'aantal_mappen': ((int,), 1),
+    'source_paths': ((list,), None),
+    'destination_path': ((str,), None),
+    'minimum_leeftijd_uren': ((int, float), 0),
+    'uitvoer_interval_minuten': ((int, float), 0.01),
+    'discord_webhook_url': ((str,), None),
+    'max_verplaatsingen_totaal': ((int,), 1),
+    'max_verplaatsingen_per_schijf': ((int,), 1),
+    'watch_modus': ((bool,), None),
+    'watch_poll_interval_seconden': ((int, float), 0.1),
+    'scan_index': ((bool,), None),
+    'discord_wachtrij_grootte': ((int,), 1),
+    'discord_timeout_seconden': ((int, float), 0.1),
+    'metrics_bestand': ((str,), None),
+    'metrics_poort': ((int,), 0),
+    'extra_destination_paths': ((list,), None),
+    'plaatsingsbeleid': ((str,), None),
+    'minimale_vrije_ruimte_mb': ((int, float), 0),
+    'deduplicatie': ((bool,), None),
+    'conflict_afhandeling': ((str,), None),
+    'quarantaine_map': ((str,), None),
+    'hash_budget_mb_per_cyclus': ((int, float), 0),
+    'recursief': ((bool,), None),
+    'max_diepte': ((int,), 0),
+    'max_scan_threads': ((int,), 1),
+    'lege_mappen_opruimen': ((bool,), None),
+    'cyclus_max_minuten': ((int, float), 0),
+    'cyclus_max_gb': ((int, float), 0),
+    'verwerkingsvolgorde': ((str,), None),
+    'bandbreedte_mb_per_seconde': ((int, float), 0),
+    'bandbreedte_per_bronmap_mb_per_seconde': ((int, float), 0),
+    'bandbreedte_per_doelmap_mb_per_seconde': ((int, float), 0),
+    'bandbreedte_schema': ((list,), None),
+    'log_bestand': ((str,), None),
+    'log_max_mb': ((int, float), 0.01),
+    'log_bewaar_aantal': ((int,), 0),
+    'log_niveau': ((str,), None),
+    'console_niveau': ((str,), None),
+    'console_samenvatting_seconden': ((int, float), 0),
+    'coordinatie': ((bool,), None),
+    'instantie_id': ((str,), None),
+    'lease_seconden': ((int, float), 5),
+    'coordinatie_verdeling': ((str,), None),
+    'stabiel_seconden': ((int, float), 0),
+    'open_bestanden_controleren': ((bool,), None)
+}
+
+# Mogelijke waarden voor plaatsingsbeleid
+PLAATSINGSBELEIDEN = ('meeste_vrije_ruimte', 'round_robin', 'gewogen_doorvoer')
+
+# Mogelijke waarden voor conflict_afhandeling
+CONFLICT_AFHANDELINGEN = ('overslaan', 'hernoemen', 'quarantaine')
+
+# Mogelijke waarden voor coordinatie_verdeling
+COORDINATIE_VERDELINGEN = ('bestanden', 'bronmappen')
+
+# Logniveaus van laag naar hoog; regels per bestand zijn 'debug'
+LOG_NIVEAUS = {'debug': 10, 'info': 20, 'waarschuwing': 30, 'fout': 40}
+
+# Prioriteit per verwerkingsvolgorde (laagste eerst); bij 'scan' wordt elk bestand direct gestart
+VERWERKINGSVOLGORDES = {
+    'scan': None,
+    'oudste_eerst': lambda bestand_stat: bestand_stat.st_mtime,
+    'grootste_eerst': lambda bestand_stat: -bestand_stat.st_size,
+    'kleinste_eerst': lambda bestand_stat: bestand_stat.st_size
+}
+
+# Stand van het laatst geladen configuratiebestand, zodat het alleen bij een wijziging opnieuw wordt gelezen
+config_cache = {
+    'stand': None,
+    'pad': None  # Pad uit --config; None is reverseraid.yml in de huidige map
+}
+
 def get_config_bestand_pad():
-    """Bepaal het pad naar het configuratiebestand in dezelfde map als het script."""
+    """Bepaal het pad naar het configuratiebestand: het pad uit --config, anders in dezelfde map als het script."""
+    if config_cache['pad']:
+        return config_cache['pad']
     script_dir = os.getcwd()
     config_path = os.path.join(script_dir, 'reverseraid.yml')
-    print(f"Config bestand pad: {config_path}")  # Debug output
     return config_path
 
+def naast_configuratie(pad):
+    """Maak een relatief pad uit de configuratie relatief aan de map van het configuratiebestand,
+    zodat het niet van de werkmap afhangt (onder systemd is dat vaak /). Een leeg pad blijft leeg."""
+    if not pad or os.path.isabs(pad):
+        return pad
+    return os.path.join(os.path.dirname(get_config_bestand_pad()), pad)
+
+def config_bestand_stand(config_bestand):
+    """Geef (apparaat, inode, mtime in ns, grootte) van het configuratiebestand terug, of None als het niet bestaat."""
+    try:
+        config_stat = os.stat(config_bestand)
+    except OSError:
+        return None
+    return (config_stat.st_dev, config_stat.st_ino, config_stat.st_mtime_ns, config_stat.st_size)
+
+def schrijf_configuratie(config, config_bestand=None):
+    """Schrijf de configuratie atomisch weg via een tijdelijk bestand en os.replace."""
+    if config_bestand is None:
+        config_bestand = get_config_bestand_pad()
+    tijdelijk = config_bestand + '.tmp'
+    with open(tijdelijk, 'w') as f:
+        yaml.dump(config, f, default_flow_style=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tijdelijk, config_bestand)
+    
+    # Ons eigen schrijven hoeft niet als wijziging te worden opgepikt
+    config_cache['stand'] = config_bestand_stand(config_bestand)
+
+def vul_standaardwaarden_aan(config):
+    """Vul ontbrekende velden in het geheugen aan met de standaardwaarden.
+    Geeft True terug als er iets is aangevuld."""
+    aangevuld = False
+    
+    # Voeg aantal_mappen toe als het ontbreekt
+    if 'aantal_mappen' not in config:
+        config['aantal_mappen'] = len(config['source_paths'])
+        aangevuld = True
+    
+    for sleutel, waarde in maak_standaard_configuratie().items():
+        if sleutel not in config:
+            config[sleutel] = waarde
+            aangevuld = True
+    return aangevuld
+
+def valideer_configuratie(config):
+    """Controleer de types en minimale waarden van de configuratie. Geeft een lijst met fouten terug."""
+    fouten = []
+    for sleutel, (types, minimum) in CONFIG_SCHEMA.items():
+        if sleutel not in config:
+            continue
+        waarde = config[sleutel]
+        # bool is een subklasse van int, maar hoort niet als getal te worden geaccepteerd
+        if not isinstance(waarde, types) or (isinstance(waarde, bool) and bool not in types):
+            fouten.append(f"'{sleutel}' heeft een ongeldig type ({type(waarde).__name__}).")
+        elif minimum is not None and waarde < minimum:
+            fouten.append(f"'{sleutel}' moet minimaal {minimum} zijn.")
+    for sleutel in ('source_paths', 'extra_destination_paths'):
+        if isinstance(config.get(sleutel), list) and not all(isinstance(pad, str) for pad in config[sleutel]):
+            fouten.append(f"'{sleutel}' mag alleen tekst bevatten.")
+    if config.get('plaatsingsbeleid', 'meeste_vrije_ruimte') not in PLAATSINGSBELEIDEN:
+        fouten.append(f"'plaatsingsbeleid' moet een van {', '.join(PLAATSINGSBELEIDEN)} zijn.")
+    if config.get('conflict_afhandeling', 'overslaan') not in CONFLICT_AFHANDELINGEN:
+        fouten.append(f"'conflict_afhandeling' moet een van {', '.join(CONFLICT_AFHANDELINGEN)} zijn.")
+    elif config.get('conflict_afhandeling') == 'quarantaine' and not config.get('quarantaine_map'):
+        fouten.append("'quarantaine_map' is verplicht bij conflict_afhandeling quarantaine.")
+    if config.get('verwerkingsvolgorde', 'scan') not in VERWERKINGSVOLGORDES:
+        fouten.append(f"'verwerkingsvolgorde' moet een van {', '.join(VERWERKINGSVOLGORDES)} zijn.")
+    if config.get('coordinatie_verdeling', 'bestanden') not in COORDINATIE_VERDELINGEN:
+        fouten.append(f"'coordinatie_verdeling' moet een van {', '.join(COORDINATIE_VERDELINGEN)} zijn.")
+    for sleutel in ('log_niveau', 'console_niveau'):
+        if config.get(sleutel, 'info') not in LOG_NIVEAUS:
+            fouten.append(f"'{sleutel}' moet een van {', '.join(LOG_NIVEAUS)} zijn.")
+    if isinstance(config.get('bandbreedte_schema'), list):
+        for nummer, tijdvak in enumerate(config['bandbreedte_schema'], start=1):
+            try:
+                lees_tijdvak(tijdvak)
+            except (TypeError, ValueError, KeyError):
+                fouten.append(f"'bandbreedte_schema' regel {nummer} moet van, tot (UU:MM) en mb_per_seconde (>= 0) bevatten.")
+    return fouten
+
 def laad_configuratie():
-    """Laad de configuratie uit het YAML-bestand of maak een nieuw bestand aan als het niet bestaat."""
+    """Laad de configuratie uit het YAML-bestand of maak een nieuw bestand aan als het niet bestaat.
+    Ontbrekende velden worden in het geheugen aangevuld; het bestand wordt hooguit één keer geschreven."""
     config_bestand = get_config_bestand_pad()
+    print(f"Config bestand pad: {config_bestand}")  # Debug output
     
     # Controleer of het configuratiebestand bestaat
     if not os.path.exists(config_bestand):
@@ -38,8 +253,7 @@ def laad_configuratie():
         config = maak_standaard_configuratie()
         
         try:
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+            schrijf_configuratie(config, config_bestand)
             print(f"Nieuw configuratiebestand '{config_bestand}' succesvol aangemaakt.")
         except Exception as e:
             print(f"Fout bij het aanmaken van het configuratiebestand: {e}")
@@ -49,53 +263,90 @@ def laad_configuratie():
     
     # Laad de configuratie
     try:
+        stand = config_bestand_stand(config_bestand)
         with open(config_bestand, 'r') as f:
             config = yaml.safe_load(f)
+        moet_schrijven = False
         
         # Controleer of de vereiste configuratievelden aanwezig zijn
-        if 'source_paths' not in config or 'destination_path' not in config:
+        if not isinstance(config, dict) or 'source_paths' not in config or 'destination_path' not in config:
             print("Fout: Het configuratiebestand mist verplichte velden (source_paths of destination_path).")
             print("Het bestand wordt hersteld naar de standaardwaarden.")
             
             config = maak_standaard_configuratie()
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+            moet_schrijven = True
         
-        # Voeg aantal_mappen toe als het ontbreekt
-        if 'aantal_mappen' not in config:
-            config['aantal_mappen'] = len(config['source_paths'])
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
-                
-        # Voeg minimum leeftijd toe als deze ontbreekt
-        if 'minimum_leeftijd_uren' not in config:
-            config['minimum_leeftijd_uren'] = 12  # Standaard 12 uur
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
-                
-        # Voeg uitvoer interval toe als deze ontbreekt
-        if 'uitvoer_interval_minuten' not in config:
-            config['uitvoer_interval_minuten'] = 10  # Standaard 10 minuten
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
-                
-        # Voeg console wissen interval toe als deze ontbreekt
-        if 'console_wissen_interval_uren' not in config:
-            config['console_wissen_interval_uren'] = 6  # Standaard 6 uur
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
-                
-        # Voeg Discord webhook URL toe als deze ontbreekt
-        if 'discord_webhook_url' not in config:
-            config['discord_webhook_url'] = ''  # Standaard lege string
-            with open(config_bestand, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+        # Vul ontbrekende velden aan en schrijf het bestand daarna hooguit één keer
+        if vul_standaardwaarden_aan(config):
+            moet_schrijven = True
+        
+        for fout in valideer_configuratie(config):
+            print(f"Waarschuwing: {fout}")
+        
+        if moet_schrijven:
+            schrijf_configuratie(config, config_bestand)
+        else:
+            config_cache['stand'] = stand
                 
         return config, True  # Geef aan dat dit een bestaand config bestand is
     except Exception as e:
         print(f"Fout bij het laden van de configuratie: {e}")
         sys.exit(1)
 
+def laad_configuratie_zonder_invoer():
+    """Laad de configuratie voor de niet-interactieve modi, zonder te vragen en zonder het bestand te schrijven.
+    Geeft (config, fouten) terug; bij fouten is config None of onbruikbaar en hoort het programma te stoppen."""
+    config_bestand = get_config_bestand_pad()
+    if not os.path.exists(config_bestand):
+        return None, [f"Het configuratiebestand '{config_bestand}' bestaat niet."]
+    
+    stand = config_bestand_stand(config_bestand)
+    try:
+        with open(config_bestand, 'r') as f:
+            config = yaml.safe_load(f)
+    except Exception as e:
+        return None, [f"Het configuratiebestand '{config_bestand}' kan niet worden gelezen: {e}"]
+    if not isinstance(config, dict) or 'source_paths' not in config or 'destination_path' not in config:
+        return None, ["Het configuratiebestand mist verplichte velden (source_paths of destination_path)."]
+    
+    vul_standaardwaarden_aan(config)
+    fouten = valideer_configuratie(config)
+    if not fouten:
+        fouten = controleer_paden(config)
+    
+    config_cache['stand'] = stand
+    return config, fouten
+
+def herlaad_configuratie():
+    """Lees de configuratie alleen opnieuw als het bestand sinds de vorige keer is gewijzigd (mtime of inode).
+    Geeft de nieuwe configuratie terug, of None als er niets is gewijzigd of de nieuwe versie ongeldig is."""
+    config_bestand = get_config_bestand_pad()
+    stand = config_bestand_stand(config_bestand)
+    if stand is None or stand == config_cache['stand']:
+        return None
+    
+    # Onthoud de stand ook bij een ongeldig bestand, zodat het niet elke cyclus opnieuw wordt gelezen
+    config_cache['stand'] = stand
+    try:
+        with open(config_bestand, 'r') as f:
+            config = yaml.safe_load(f)
+    except Exception as e:
+        print(f"Fout bij het herladen van de configuratie, de huidige configuratie blijft actief: {e}")
+        return None
+    
+    if not isinstance(config, dict) or 'source_paths' not in config or 'destination_path' not in config:
+        print("Fout: Het gewijzigde configuratiebestand mist verplichte velden, de huidige configuratie blijft actief.")
+        return None
+    vul_standaardwaarden_aan(config)
+    fouten = valideer_configuratie(config)
+    if fouten:
+        for fout in fouten:
+            print(f"Fout in gewijzigde configuratie: {fout}")
+        print("De huidige configuratie blijft actief.")
+        return None
+    
+    return config
+
 def vraag_en_update_aantal_mappen(config):
     """Vraag hoeveel mappen de gebruiker wil configureren."""
     huidige_aantal = config.get('aantal_mappen', len(config['source_paths']))
@@ -120,15 +371,13 @@ def vraag_en_update_aantal_mappen(config):
                     config['source_paths'].extend([''] * (nieuw_aantal - len(config['source_paths'])))
                 
                 # Sla de gewijzigde configuratie op
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
                 print(f"Aantal bronmappen bijgewerkt naar {nieuw_aantal}.")
         else:
             # Als er geen invoer is, zorg ervoor dat het aantal_mappen veld overeenkomt met het aantal paden
             if huidige_aantal != len(config['source_paths']):
                 config['aantal_mappen'] = len(config['source_paths'])
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
     except ValueError:
         print("Ongeldige invoer. Het aantal blijft ongewijzigd.")
     except Exception as e:
@@ -152,8 +401,7 @@ def vraag_en_update_leeftijd(config):
                 config['minimum_leeftijd_uren'] = nieuwe_leeftijd
                 
                 # Sla de gewijzigde configuratie op
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
                 print(f"Minimale leeftijd bijgewerkt naar {nieuwe_leeftijd} uur.")
     except ValueError:
         print("Ongeldige invoer. De leeftijd blijft ongewijzigd.")
@@ -178,8 +426,7 @@ def vraag_en_update_interval(config):
                 config['uitvoer_interval_minuten'] = nieuw_interval
                 
                 # Sla de gewijzigde configuratie op
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
                 print(f"Uitvoeringsinterval bijgewerkt naar {nieuw_interval} minuten.")
     except ValueError:
         print("Ongeldige invoer. Het interval blijft ongewijzigd.")
@@ -188,32 +435,6 @@ def vraag_en_update_interval(config):
     
     return config
 
-def vraag_en_update_console_wissen_interval(config):
-    """Vraag het interval voor het wissen van de console in uren."""
-    huidig_interval = config.get('console_wissen_interval_uren', 6)
-    
-    try:
-        nieuw_interval = input(f"Interval voor het wissen van de console in uren? [{huidig_interval}]: ")
-        if nieuw_interval.strip():
-            nieuw_interval = float(nieuw_interval)
-            if nieuw_interval < 0:
-                print("Het interval kan niet negatief zijn. De waarde wordt ingesteld op 0 (nooit wissen).")
-                nieuw_interval = 0
-            
-            if nieuw_interval != huidig_interval:
-                config['console_wissen_interval_uren'] = nieuw_interval
-                
-                # Sla de gewijzigde configuratie op
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
-                print(f"Console wissen interval bijgewerkt naar {nieuw_interval} uur.")
-    except ValueError:
-        print("Ongeldige invoer. Het interval blijft ongewijzigd.")
-    except Exception as e:
-        print(f"Fout bij het bijwerken van het console wissen interval: {e}")
-    
-    return config
-
 def vraag_en_update_discord_webhook(config):
     """Vraag de Discord webhook URL."""
     huidige_webhook = config.get('discord_webhook_url', '')
@@ -225,20 +446,17 @@ def vraag_en_update_discord_webhook(config):
             if nieuwe_webhook.lower() == 'x':
                 config['discord_webhook_url'] = ''
                 print("Discord webhook verwijderd.")
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
             elif nieuwe_webhook.strip():
                 config['discord_webhook_url'] = nieuwe_webhook
                 print("Discord webhook bijgewerkt.")
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
         else:
             nieuwe_webhook = input("Discord webhook URL? (Laat leeg om over te slaan): ")
             if nieuwe_webhook.strip():
                 config['discord_webhook_url'] = nieuwe_webhook
                 print("Discord webhook ingesteld.")
-                with open(get_config_bestand_pad(), 'w') as f:
-                    yaml.dump(config, f, default_flow_style=False)
+                schrijf_configuratie(config)
                 
                 # Test de webhook
                 test_succes = verstuur_discord_bericht(nieuwe_webhook, "Test bericht van Reverse RAID 0 Simulator. De webhook is succesvol ingesteld!")
@@ -269,8 +487,7 @@ def vraag_en_update_paden(config):
     # Update het configuratiebestand als er wijzigingen zijn
     if gewijzigd:
         try:
-            with open(get_config_bestand_pad(), 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+            schrijf_configuratie(config)
             print("Configuratie succesvol bijgewerkt.")
         except Exception as e:
             print(f"Fout bij het opslaan van de configuratie: {e}")
@@ -278,142 +495,2937 @@ def vraag_en_update_paden(config):
     
     return config
 
-def valideer_paden(config):
-    """Valideer of de opgegeven paden bestaan."""
+def controleer_paden(config):
+    """Controleer of alle bron- en doelmappen zijn ingevuld en bestaan. Geeft een lijst met problemen terug."""
+    problemen = []
     for i, pad in enumerate(config['source_paths']):
-        if not os.path.isdir(pad):
-            print(f"Waarschuwing: Bronmap {i+1} ({pad}) bestaat niet of is geen map.")
-            return False
+        if not pad:
+            problemen.append(f"Bronmap {i+1} is niet ingevuld.")
+        elif not os.path.isdir(pad):
+            problemen.append(f"Bronmap {i+1} ({pad}) bestaat niet of is geen map.")
     
-    if not os.path.isdir(config['destination_path']):
-        print(f"Waarschuwing: Doelmap ({config['destination_path']}) bestaat niet of is geen map.")
-        return False
+    if not config['destination_path']:
+        problemen.append("Doelmap is niet ingevuld.")
+    for pad in get_doelmappen(config):
+        if pad and not os.path.isdir(pad):
+            problemen.append(f"Doelmap ({pad}) bestaat niet of is geen map.")
+    return problemen
+
+def valideer_paden(config):
+    """Valideer of de opgegeven paden bestaan."""
+    problemen = controleer_paden(config)
+    for probleem in problemen:
+        print(f"Waarschuwing: {probleem}")
+    return not problemen
+
+def get_doelmappen(config):
+    """Geef alle doelmappen: destination_path gevolgd door de extra doelmappen."""
+    return [config['destination_path']] + [pad for pad in config.get('extra_destination_paths', []) if pad]
+
+DISCORD_MAX_LENGTE = 2000  # Maximaal aantal tekens in één Discord bericht
+DISCORD_TIMEOUT = 10       # Standaard timeout in seconden voor een webhook aanroep
+
+discord_sessie_lock = threading.Lock()
+discord_sessie = None
+
+def get_discord_sessie():
+    """Geef de gedeelde requests.Session terug, zodat verbindingen naar Discord worden hergebruikt."""
+    global discord_sessie
+    with discord_sessie_lock:
+        if discord_sessie is None:
+            # requests wordt pas geladen als er echt een webhook is; dat scheelt opstarttijd zonder Discord
+            import requests
+            discord_sessie = requests.Session()
+            discord_sessie.headers.update({"Content-Type": "application/json"})
+        return discord_sessie
+
+def post_discord_webhook(webhook_url, bericht, timeout=DISCORD_TIMEOUT):
+    """Post één bericht naar een Discord webhook.
+    Geeft (gelukt, wachttijd) terug; wachttijd is het aantal seconden uit een 429 antwoord, anders None."""
+    response = get_discord_sessie().post(webhook_url, data=json.dumps({"content": bericht}), timeout=timeout)
     
-    return True
+    if response.status_code in (200, 204):
+        return True, None
+    if response.status_code == 429:
+        # Rate limit: Discord geeft retry_after in seconden in de body, anders in de Retry-After header
+        try:
+            wachttijd = float(response.json().get('retry_after'))
+        except (ValueError, TypeError, AttributeError):
+            wachttijd = float(response.headers.get('Retry-After', 1))
+        return False, wachttijd
+    print(f"Fout bij versturen Discord bericht: {response.status_code} - {response.text}")
+    return False, None
 
-def verstuur_discord_bericht(webhook_url, bericht):
+def verstuur_discord_bericht(webhook_url, bericht, timeout=DISCORD_TIMEOUT):
     """Verstuur een bericht naar Discord via een webhook."""
     if not webhook_url:
         return False
     
     try:
-        data = {
-            "content": bericht
-        }
-        headers = {
-            "Content-Type": "application/json"
-        }
-        response = requests.post(webhook_url, data=json.dumps(data), headers=headers)
-        
-        if response.status_code == 204:
-            return True
-        else:
-            print(f"Fout bij versturen Discord bericht: {response.status_code} - {response.text}")
-            return False
+        gelukt, wachttijd = post_discord_webhook(webhook_url, bericht, timeout)
+        if wachttijd is not None:
+            # Eén keer opnieuw proberen na de rate limit
+            time.sleep(wachttijd)
+            gelukt, _ = post_discord_webhook(webhook_url, bericht, timeout)
+        return gelukt
             
     except Exception as e:
         print(f"Fout bij versturen Discord bericht: {e}")
         return False
 
-def logboek_bericht(config, bericht, console_output=True, belangrijk=True):
-    """Verstuur een bericht naar het logboek (console en Discord).
-    Param belangrijk: Alleen belangrijk=True berichten worden naar Discord gestuurd"""
+def bundel_berichten(berichten, max_lengte=DISCORD_MAX_LENGTE):
+    """Voeg berichten samen tot zo weinig mogelijk blokken van maximaal max_lengte tekens."""
+    blokken = []
+    huidig = ''
+    for bericht in berichten:
+        # Te lange berichten worden in stukken geknipt
+        while len(bericht) > max_lengte:
+            if huidig:
+                blokken.append(huidig)
+                huidig = ''
+            blokken.append(bericht[:max_lengte])
+            bericht = bericht[max_lengte:]
+        if huidig and len(huidig) + 1 + len(bericht) > max_lengte:
+            blokken.append(huidig)
+            huidig = ''
+        huidig = f"{huidig}\n{bericht}" if huidig else bericht
+    if huidig:
+        blokken.append(huidig)
+    return blokken
+
+class DiscordNotifier:
+    """Verstuurt Discord berichten op de achtergrond.
+    Berichten gaan via een begrensde wachtrij; de verzender bundelt ze tot zo weinig mogelijk
+    webhook aanroepen, respecteert 429 retry_after en telt berichten die bij een volle wachtrij
+    zijn weggelaten."""
+    
+    def __init__(self, webhook_url, wachtrij_grootte=1000, timeout=DISCORD_TIMEOUT, bundel_seconden=1.0, max_pogingen=3):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.bundel_seconden = bundel_seconden
+        self.max_pogingen = max_pogingen
+        self.wachtrij = queue.Queue(maxsize=max(1, wachtrij_grootte))
+        self.lock = threading.Lock()
+        self.weggelaten = 0
+        self.gestopt = threading.Event()
+        self.thread = threading.Thread(target=self._verzend_lus, name='discord', daemon=True)
+        self.thread.start()
+    
+    def verstuur(self, bericht):
+        """Zet een bericht in de wachtrij zonder te blokkeren."""
+        try:
+            self.wachtrij.put_nowait(bericht)
+        except queue.Full:
+            with self.lock:
+                self.weggelaten += 1
+    
+    def wachtrij_diepte(self):
+        """Geef het aantal berichten dat nog verstuurd moet worden."""
+        return self.wachtrij.qsize()
+    
+    def _haal_batch(self):
+        """Wacht op een eerste bericht en verzamel daarna kort alles wat er nog bij komt."""
+        try:
+            berichten = [self.wachtrij.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        einde = time.monotonic() + self.bundel_seconden
+        while not self.gestopt.is_set():
+            resterend = einde - time.monotonic()
+            if resterend <= 0:
+                break
+            try:
+                berichten.append(self.wachtrij.get(timeout=resterend))
+            except queue.Empty:
+                break
+        # Na een stopverzoek wordt de rest van de wachtrij direct meegenomen
+        while True:
+            try:
+                berichten.append(self.wachtrij.get_nowait())
+            except queue.Empty:
+                break
+        return berichten
+    
+    def _post(self, blok):
+        """Post één blok, met wachten bij een rate limit en een beperkt aantal herhalingen bij fouten."""
+        import requests
+        poging = 0
+        while poging < self.max_pogingen:
+            try:
+                gelukt, wachttijd = post_discord_webhook(self.webhook_url, blok, self.timeout)
+            except requests.RequestException as e:
+                print(f"Fout bij versturen Discord bericht: {e}")
+                gelukt, wachttijd = False, None
+            if gelukt:
+                return True
+            if wachttijd is not None:
+                # Een rate limit telt niet als mislukte poging
+                time.sleep(wachttijd)
+                continue
+            poging += 1
+            time.sleep(min(2 ** poging, 30))
+        return False
+    
+    def _verzend_lus(self):
+        while True:
+            berichten = self._haal_batch()
+            with self.lock:
+                weggelaten, self.weggelaten = self.weggelaten, 0
+            if weggelaten:
+                berichten.append(f"... {weggelaten} bericht(en) weggelaten omdat de Discord wachtrij vol was.")
+            if not berichten:
+                if self.gestopt.is_set():
+                    return
+                continue
+            for blok in bundel_berichten(berichten):
+                self._post(blok)
+    
+    def stop(self, timeout=None):
+        """Verstuur wat er nog in de wachtrij staat en stop de verzender."""
+        self.gestopt.set()
+        self.thread.join(timeout)
+
+discord_notifiers_lock = threading.Lock()
+discord_notifiers = {}
+
+def get_discord_notifier(config):
+    """Geef de achtergrondverzender voor de webhook uit de configuratie (wordt bij eerste gebruik gestart)."""
+    webhook_url = config.get('discord_webhook_url', '')
+    if not webhook_url:
+        return None
+    with discord_notifiers_lock:
+        notifier = discord_notifiers.get(webhook_url)
+        if notifier is None:
+            notifier = DiscordNotifier(webhook_url,
+                                       wachtrij_grootte=config.get('discord_wachtrij_grootte', 1000),
+                                       timeout=config.get('discord_timeout_seconden', DISCORD_TIMEOUT))
+            discord_notifiers[webhook_url] = notifier
+        return notifier
+
+def stop_discord_notifiers(timeout=None):
+    """Verstuur alle openstaande Discord berichten en stop de verzenders."""
+    with discord_notifiers_lock:
+        notifiers = list(discord_notifiers.values())
+        discord_notifiers.clear()
+    for notifier in notifiers:
+        notifier.stop(timeout)
+
+console_lock = threading.Lock()
+
+# Totale tijd en aantal berichten van logboek_bericht, zodat een cyclus de log-fase kan meten
+logboek_statistiek = {
+    'berichten': 0,
+    'seconden': 0.0
+}
+
+# Omschrijving per soort regel per bestand in de console samenvatting
+LOG_GEBEURTENISSEN = {
+    'verplaatst': 'verplaatst',
+    'te_nieuw': 'te nieuw',
+    'bestaat_al': 'bestaat al',
+    'duplicaat': 'duplicaten verwijderd',
+    'conflict': 'conflicten',
+    'andere_instantie': 'bij een andere instantie',
+    'onstabiel': 'nog niet stabiel'
+}
+
+class LogPijplijn:
+    """Schrijft logregels vanuit een achtergrondthread, zodat workers niet op de terminal of de
+    schijf wachten. Elke regel gaat als JSON naar een logbestand dat op grootte roteert. Regels
+    onder console_niveau worden per soort geteld en hooguit eens per console_samenvatting_seconden
+    als één samenvatting in de console gezet."""
+    
+    SAMENVATTING = object()  # Markering: zet de openstaande samenvatting nu in de console
+    STOP = object()
+    
+    def __init__(self, config, wachtrij_grootte=10000):
+        self.wachtrij = queue.Queue(maxsize=wachtrij_grootte)
+        self.stel_in(config)
+        self.bestand = None
+        self.bestand_pad = None
+        self.bestand_grootte = 0
+        self.onderdrukt = collections.Counter()
+        self.onderdrukt_sinds = None
+        self.laatste_samenvatting = time.monotonic()
+        self.weggelaten = 0
+        self.thread = threading.Thread(target=self._schrijf_lus, name='logboek', daemon=True)
+        self.thread.start()
+    
+    @staticmethod
+    def instellingen_sleutel(config):
+        """Geef de loginstellingen als tuple, om goedkoop te zien of ze zijn gewijzigd."""
+        return tuple(config.get(sleutel) for sleutel in ('log_bestand', 'log_max_mb', 'log_bewaar_aantal', 'log_niveau', 'console_niveau', 'console_samenvatting_seconden'))
+    
+    def stel_in(self, config):
+        """Neem de loginstellingen over uit de configuratie; de schrijver leest ze bij elke regel."""
+        self.sleutel = self.instellingen_sleutel(config)
+        self.instellingen = {
+            'pad': naast_configuratie(config.get('log_bestand', 'reverseraid.log')),
+            'max_bytes': int(config.get('log_max_mb', 10) * 1024 * 1024),
+            'bewaar': config.get('log_bewaar_aantal', 3),
+            'bestand_niveau': LOG_NIVEAUS.get(config.get('log_niveau', 'info'), LOG_NIVEAUS['info']),
+            'console_niveau': LOG_NIVEAUS.get(config.get('console_niveau', 'info'), LOG_NIVEAUS['info']),
+            'samenvatting_seconden': config.get('console_samenvatting_seconden', 10)
+        }
+    
+    def schrijf(self, regel):
+        """Zet een logregel in de wachtrij. Bij een volle wachtrij worden debugregels weggelaten."""
+        instellingen = self.instellingen
+        if regel['niveau'] < min(instellingen['bestand_niveau'], instellingen['console_niveau']) and regel['gebeurtenis'] is None:
+            return
+        try:
+            if regel['niveau'] <= LOG_NIVEAUS['debug']:
+                self.wachtrij.put_nowait(regel)
+            else:
+                self.wachtrij.put(regel, timeout=1)
+        except queue.Full:
+            with console_lock:
+                self.weggelaten += 1
+    
+    def vat_samen(self):
+        """Laat de schrijver de openstaande tellingen nu samenvatten, bijvoorbeeld aan het einde van een cyclus."""
+        try:
+            self.wachtrij.put(self.SAMENVATTING, timeout=1)
+        except queue.Full:
+            pass
+    
+    def leeg(self):
+        """Wacht tot alle regels in de wachtrij zijn geschreven."""
+        self.vat_samen()
+        self.wachtrij.join()
+    
+    def stop(self, timeout=None):
+        """Schrijf de resterende regels weg en stop de schrijver."""
+        self.vat_samen()
+        self.wachtrij.put(self.STOP)
+        self.thread.join(timeout)
+    
+    def _open(self, pad):
+        self.bestand = open(pad, 'a', encoding='utf-8')
+        self.bestand_pad = pad
+        self.bestand_grootte = self.bestand.tell()
+    
+    def _sluit(self):
+        if self.bestand is not None:
+            self.bestand.close()
+        self.bestand = None
+        self.bestand_pad = None
+    
+    def _roteer(self, pad, bewaar):
+        """Hernoem reverseraid.log naar .1, .1 naar .2 enzovoort; het oudste bestand vervalt."""
+        self._sluit()
+        if bewaar > 0:
+            for nummer in range(bewaar - 1, 0, -1):
+                if os.path.exists(f"{pad}.{nummer}"):
+                    os.replace(f"{pad}.{nummer}", f"{pad}.{nummer + 1}")
+            os.replace(pad, f"{pad}.1")
+        else:
+            os.unlink(pad)
+        self._open(pad)
+    
+    def _naar_bestand(self, regel, instellingen):
+        pad = instellingen['pad']
+        if not pad:
+            self._sluit()
+            return
+        if self.bestand_pad != pad:
+            self._sluit()
+            self._open(pad)
+        tekst = json.dumps({
+            'tijd': regel['tijd'].isoformat(timespec='milliseconds'),
+            'niveau': regel['niveau_naam'],
+            'bericht': regel['bericht'].strip(),
+            'gebeurtenis': regel['gebeurtenis'],
+            'thread': regel['thread']
+        }, ensure_ascii=False) + '\n'
+        self.bestand.write(tekst)
+        self.bestand_grootte += len(tekst.encode('utf-8'))
+        if self.bestand_grootte >= instellingen['max_bytes']:
+            self._roteer(pad, instellingen['bewaar'])
+    
+    def _samenvatting(self):
+        if self.onderdrukt:
+            onderdelen = ', '.join(f"{aantal} {LOG_GEBEURTENISSEN.get(soort, soort)}" for soort, aantal in self.onderdrukt.most_common())
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Voortgang sinds {self.onderdrukt_sinds.strftime('%H:%M:%S')}: {onderdelen}")
+            self.onderdrukt.clear()
+        self.laatste_samenvatting = time.monotonic()
+    
+    def _verwerk(self, regel):
+        instellingen = self.instellingen
+        if regel['niveau'] >= instellingen['bestand_niveau']:
+            try:
+                self._naar_bestand(regel, instellingen)
+            except OSError as e:
+                # Zonder werkend logbestand gaat alleen de console door
+                self._sluit()
+                self.instellingen = dict(instellingen, pad='')
+                print(f"Fout bij schrijven van logbestand, logbestand uitgeschakeld: {e}")
+        if not regel['console']:
+            return
+        if regel['niveau'] >= instellingen['console_niveau']:
+            print(regel['regel'])
+        elif regel['gebeurtenis'] is not None and instellingen['console_niveau'] <= LOG_NIVEAUS['info']:
+            # De samenvatting is zelf een info regel en verschijnt dus niet bij een hoger console niveau
+            if not self.onderdrukt:
+                self.onderdrukt_sinds = regel['tijd']
+            self.onderdrukt[regel['gebeurtenis']] += 1
+    
+    def _schrijf_lus(self):
+        while True:
+            try:
+                regel = self.wachtrij.get(timeout=0.5)
+            except queue.Empty:
+                regel = None
+            try:
+                if regel is self.STOP:
+                    self._sluit()
+                    return
+                if regel is self.SAMENVATTING:
+                    self._samenvatting()
+                elif regel is not None:
+                    self._verwerk(regel)
+                if self.onderdrukt and time.monotonic() - self.laatste_samenvatting >= self.instellingen['samenvatting_seconden']:
+                    self._samenvatting()
+                # Aan het einde van een reeks regels het bestand wegschrijven
+                if self.bestand is not None and self.wachtrij.empty():
+                    self.bestand.flush()
+            except Exception as e:
+                print(f"Fout in logboek: {e}")
+            finally:
+                if regel is not None:
+                    self.wachtrij.task_done()
+
+# De actieve log pijplijn; wordt bij het eerste bericht gestart
+log_pijplijn = None
+log_pijplijn_lock = threading.Lock()
+
+def get_log_pijplijn(config):
+    """Geef de log pijplijn terug en neem gewijzigde loginstellingen over."""
+    global log_pijplijn
+    pijplijn = log_pijplijn
+    if pijplijn is None:
+        with log_pijplijn_lock:
+            if log_pijplijn is None:
+                log_pijplijn = LogPijplijn(config)
+            pijplijn = log_pijplijn
+    if pijplijn.sleutel != LogPijplijn.instellingen_sleutel(config):
+        pijplijn.stel_in(config)
+    return pijplijn
+
+def leeg_logboek():
+    """Wacht tot alle logregels zijn geschreven (bijvoorbeeld voordat stdout wordt omgeleid)."""
+    if log_pijplijn is not None:
+        log_pijplijn.leeg()
+
+def stop_logboek(timeout=None):
+    """Schrijf de resterende logregels weg en stop de log pijplijn."""
+    global log_pijplijn
+    with log_pijplijn_lock:
+        pijplijn, log_pijplijn = log_pijplijn, None
+    if pijplijn is not None:
+        pijplijn.stop(timeout)
+
+def logboek_bericht(config, bericht, console_output=True, belangrijk=True, niveau='info', gebeurtenis=None):
+    """Verstuur een bericht naar het logboek (logbestand, console en Discord).
+    Het logbestand en de console worden door een achtergrondthread geschreven.
+    Param belangrijk: Alleen belangrijk=True berichten worden naar Discord gestuurd
+    Param niveau: debug, info, waarschuwing of fout
+    Param gebeurtenis: Soort regel per bestand (zie LOG_GEBEURTENISSEN) voor de samenvatting in de console"""
+    begin = time.perf_counter()
+    
     # Voeg tijdstempel toe
-    tijdstempel = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    volledig_bericht = f"[{tijdstempel}] {bericht}"
+    tijdstip = datetime.now()
+    volledig_bericht = f"[{tijdstip.strftime('%Y-%m-%d %H:%M:%S')}] {bericht}"
     
-    # Output naar console
-    if console_output:
-        print(volledig_bericht)
+    get_log_pijplijn(config).schrijf({
+        'tijd': tijdstip,
+        'niveau': LOG_NIVEAUS[niveau],
+        'niveau_naam': niveau,
+        'bericht': bericht,
+        'regel': volledig_bericht,
+        'gebeurtenis': gebeurtenis,
+        'console': console_output,
+        'thread': threading.current_thread().name
+    })
     
-    # Verstuur naar Discord als de webhook is geconfigureerd en het bericht belangrijk is
-    discord_webhook_url = config.get('discord_webhook_url', '')
-    if discord_webhook_url and belangrijk:
-        verstuur_discord_bericht(discord_webhook_url, volledig_bericht)
+    # Zet het bericht in de Discord wachtrij als de webhook is geconfigureerd en het bericht belangrijk is
+    if belangrijk:
+        notifier = get_discord_notifier(config)
+        if notifier is not None:
+            notifier.verstuur(volledig_bericht)
+    
+    with console_lock:
+        logboek_statistiek['berichten'] += 1
+        logboek_statistiek['seconden'] += time.perf_counter() - begin
+
+def toestand_bestand_pad(config, naam, extensie):
+    """Bepaal het pad naar een toestandsbestand naast het configuratiebestand.
+    Met een instantie_id krijgt elke instantie een eigen bestand, zodat instanties met dezelfde configuratie elkaars toestand niet overschrijven."""
+    instantie_id = (config or {}).get('instantie_id', '').replace(os.sep, '_')
+    if instantie_id:
+        naam = f"{naam}.{instantie_id}"
+    return naast_configuratie(f"{naam}.{extensie}")
+
+def get_journaal_bestand_pad(config=None):
+    """Bepaal het pad naar het verplaatsjournaal, naast het configuratiebestand."""
+    return toestand_bestand_pad(config, 'reverseraid', 'journal')
+
+def vergrendel_toestand(config):
+    """Neem een exclusieve lock op de toestand (journaal en scan index) van deze instantie.
+    Een tweede proces met dezelfde toestand zou de kopieën van het eerste als onderbroken herstellen
+    en bij het compacteren van het journaal regels verliezen, dus dan stopt het programma.
+    Geeft het open lockbestand terug; de lock geldt zolang dat open blijft."""
+    try:
+        import fcntl
+    except ImportError:
+        return None  # Geen flock op dit platform
+    pad = toestand_bestand_pad(config, 'reverseraid', 'lock')
+    try:
+        bestand = open(pad, 'a')
+    except OSError as e:
+        logboek_bericht(config, f"Lockbestand {pad} kan niet worden geopend ({e}), doorgaan zonder lock.", belangrijk=False)
+        return None
+    try:
+        fcntl.flock(bestand, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        bestand.close()
+        logboek_bericht(config, f"Een andere instantie gebruikt al de toestand in {os.path.dirname(pad)}; "
+                                f"geef elke instantie een eigen 'instantie_id' of configuratiemap.", belangrijk=True, niveau='fout')
+        sys.exit(EXIT_CONFIG)
+    return bestand
+
+def tijdelijk_doel_pad(doel_pad):
+    """Geef de tijdelijke naam waaronder een bestand in de doelmap wordt gekopieerd.
+    Door de vaste naam kan een onderbroken kopie na een herstart worden hervat."""
+    map_pad, naam = os.path.split(doel_pad)
+    return os.path.join(map_pad, f".{naam}.reverseraid-tmp")
 
-def verplaats_bestanden(config):
-    """Verplaats bestanden van bronmappen naar doelmap."""
-    doelmap = config['destination_path']
+class VerplaatsJournaal:
+    """Write-ahead journaal voor verplaatsingen tussen schijven.
+    Elke regel is een JSON object; een verplaatsing is open tot er een 'klaar' regel voor hetzelfde doel volgt."""
     
-    # Haal de minimale leeftijd uit de configuratie
-    minimum_leeftijd = config.get('minimum_leeftijd_uren', 12)
+    def __init__(self, pad):
+        self.pad = pad
+        self.lock = threading.Lock()
+        self.bestand = open(pad, 'a', encoding='utf-8')
+    
+    def _schrijf(self, regel):
+        with self.lock:
+            self.bestand.write(json.dumps(regel) + "\n")
+            self.bestand.flush()
+            os.fsync(self.bestand.fileno())
+    
+    def begin(self, bron_pad, doel_pad, bron_stat):
+        """Leg vast dat een kopie naar de tijdelijke naam begint."""
+        self._schrijf({'status': 'begin', 'bron': bron_pad, 'doel': doel_pad,
+                       'grootte': bron_stat.st_size, 'mtime_ns': bron_stat.st_mtime_ns})
+    
+    def klaar(self, doel_pad):
+        """Leg vast dat een verplaatsing volledig is afgerond of opgeruimd."""
+        self._schrijf({'status': 'klaar', 'doel': doel_pad})
+    
+    def open_verplaatsingen(self):
+        """Geef alle begonnen maar niet afgeronde verplaatsingen terug."""
+        open_items = {}
+        with self.lock:
+            with open(self.pad, 'r', encoding='utf-8') as f:
+                for regel in f:
+                    try:
+                        item = json.loads(regel)
+                    except ValueError:
+                        # Een half geschreven laatste regel na een crash
+                        continue
+                    if item.get('status') == 'begin':
+                        open_items[item['doel']] = item
+                    else:
+                        open_items.pop(item.get('doel'), None)
+        return list(open_items.values())
+    
+    def compacteer(self):
+        """Herschrijf het journaal met alleen de open verplaatsingen."""
+        open_items = self.open_verplaatsingen()
+        with self.lock:
+            tijdelijk = self.pad + '.tmp'
+            with open(tijdelijk, 'w', encoding='utf-8') as f:
+                for item in open_items:
+                    f.write(json.dumps(item) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.bestand.close()
+            os.replace(tijdelijk, self.pad)
+            self.bestand = open(self.pad, 'a', encoding='utf-8')
+    
+    def sluit(self):
+        """Sluit het journaal."""
+        with self.lock:
+            self.bestand.close()
+
+def open_verplaats_journaal(config):
+    """Open het verplaatsjournaal. Geeft None terug als dat niet lukt."""
+    try:
+        return VerplaatsJournaal(get_journaal_bestand_pad(config))
+    except OSError as e:
+        logboek_bericht(config, f"Verplaatsjournaal kan niet worden geopend ({e}), onderbroken kopieën kunnen niet worden hervat.", belangrijk=True)
+        return None
+
+def fsync_map(map_pad):
+    """Fsync een map zodat een rename of unlink daarin duurzaam is."""
+    try:
+        fd = os.open(map_pad, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+KOPIEER_BLOK_GROOTTE = 8 * 1024 * 1024  # Bytes per copy_file_range/sendfile aanroep
+KOPIEER_BLOK_GROOTTE_BEGRENSD = 1024 * 1024  # Kleinere blokken bij een bandbreedtelimiet voor een gelijkmatiger tempo
+
+class TokenBucket:
+    """Token bucket in bytes per seconde. Een aanvraag groter dan de voorraad maakt schuld;
+    de aanvrager wacht tot die schuld is ingelopen. Wachtende threads komen zo op volgorde
+    van aanvraag aan de beurt en delen de snelheid eerlijk."""
+    
+    def __init__(self, snelheid, burst_seconden=1.0):
+        self.lock = threading.Lock()
+        self.burst_seconden = burst_seconden
+        self.snelheid = 0
+        self.tokens = 0.0
+        self.laatst = time.monotonic()
+        self.stel_snelheid_in(snelheid)
+    
+    def stel_snelheid_in(self, snelheid):
+        """Pas de snelheid aan (0 = onbeperkt); de opgebouwde schuld blijft staan."""
+        with self.lock:
+            if snelheid != self.snelheid:
+                self.snelheid = snelheid
+                self.tokens = min(self.tokens, snelheid * self.burst_seconden)
+    
+    def neem(self, aantal):
+        """Neem aantal bytes af en wacht zo nodig. Geeft de gewachte tijd in seconden terug."""
+        with self.lock:
+            if self.snelheid <= 0:
+                return 0.0
+            nu = time.monotonic()
+            self.tokens = min(self.snelheid * self.burst_seconden, self.tokens + (nu - self.laatst) * self.snelheid)
+            self.laatst = nu
+            self.tokens -= aantal
+            wachttijd = -self.tokens / self.snelheid if self.tokens < 0 else 0.0
+        if wachttijd > 0:
+            time.sleep(wachttijd)
+        return wachttijd
+
+def lees_tijdvak(tijdvak):
+    """Zet een regel uit bandbreedte_schema om naar (van, tot, bytes per seconde), met van en tot in minuten na middernacht."""
+    def minuten(tekst):
+        uren, minuten = str(tekst).split(':')
+        uren, minuten = int(uren), int(minuten)
+        if not (0 <= uren <= 24 and 0 <= minuten < 60):
+            raise ValueError(tekst)
+        return uren * 60 + minuten
+    snelheid = tijdvak['mb_per_seconde']
+    if isinstance(snelheid, bool) or not isinstance(snelheid, (int, float)) or snelheid < 0:
+        raise ValueError(snelheid)
+    return minuten(tijdvak['van']), minuten(tijdvak['tot']), int(snelheid * 1024 * 1024)
+
+class Bandbreedte:
+    """Begrenst de kopieersnelheid tussen schijven globaal, per bronmap en per doelmap.
+    De globale limiet volgt bandbreedte_schema, bijvoorbeeld vol gas 's nachts en begrensd overdag.
+    Een verplaatsing op dezelfde schijf is een rename en wordt niet begrensd."""
+    
+    def __init__(self, config):
+        self.lock = threading.Lock()
+        self.globaal = TokenBucket(0)
+        self.per_bronmap = {}
+        self.per_doelmap = {}
+        self.gekopieerd = 0
+        self.gewacht = 0.0
+        self.schema_controle = 0.0
+        self.stel_in(config)
+    
+    def stel_in(self, config):
+        """Lees de limieten (opnieuw) uit de configuratie; bestaande buckets krijgen de nieuwe snelheid."""
+        with self.lock:
+            self.standaard = int(config.get('bandbreedte_mb_per_seconde', 0) * 1024 * 1024)
+            self.bronmap_snelheid = int(config.get('bandbreedte_per_bronmap_mb_per_seconde', 0) * 1024 * 1024)
+            self.doelmap_snelheid = int(config.get('bandbreedte_per_doelmap_mb_per_seconde', 0) * 1024 * 1024)
+            self.schema = [lees_tijdvak(tijdvak) for tijdvak in config.get('bandbreedte_schema', [])]
+            for bucket in self.per_bronmap.values():
+                bucket.stel_snelheid_in(self.bronmap_snelheid)
+            for bucket in self.per_doelmap.values():
+                bucket.stel_snelheid_in(self.doelmap_snelheid)
+        self.globaal.stel_snelheid_in(self.huidige_limiet())
+    
+    def huidige_limiet(self, nu=None):
+        """Geef de globale limiet in bytes per seconde voor dit moment (0 = onbeperkt)."""
+        nu = nu or datetime.now()
+        minuut = nu.hour * 60 + nu.minute
+        for van, tot, snelheid in self.schema:
+            # Een tijdvak als 22:00-06:00 loopt over middernacht
+            if (van <= minuut < tot) if van <= tot else (minuut >= van or minuut < tot):
+                return snelheid
+        return self.standaard
+    
+    def begrensd(self):
+        """Geef True terug als er een limiet is ingesteld (of door het schema kan gelden)."""
+        return bool(self.standaard or self.bronmap_snelheid or self.doelmap_snelheid or self.schema)
+    
+    def begrenzer(self, bronmap, doelmap):
+        """Geef een functie terug die vóór elk gekopieerd blok wordt aangeroepen, of None zonder limieten."""
+        if not self.begrensd():
+            return None
+        with self.lock:
+            buckets = [self.globaal]
+            if self.bronmap_snelheid:
+                buckets.append(self.per_bronmap.setdefault(bronmap, TokenBucket(self.bronmap_snelheid)))
+            if self.doelmap_snelheid:
+                buckets.append(self.per_doelmap.setdefault(doelmap, TokenBucket(self.doelmap_snelheid)))
+        
+        def neem(aantal):
+            # Het schema wordt hooguit één keer per seconde opnieuw bekeken
+            nu = time.monotonic()
+            if self.schema and nu - self.schema_controle >= 1.0:
+                self.schema_controle = nu
+                self.globaal.stel_snelheid_in(self.huidige_limiet())
+            gewacht = sum(bucket.neem(aantal) for bucket in buckets)
+            with self.lock:
+                self.gekopieerd += aantal
+                self.gewacht += gewacht
+        return neem
+    
+    def stand(self):
+        """Geef (gekopieerde bytes, gewachte seconden) tot nu toe terug, om per cyclus het verschil te bepalen."""
+        with self.lock:
+            return self.gekopieerd, self.gewacht
+
+def kopieer_bytes(bron_fd, doel_fd, offset, grootte, begrenzer=None):
+    """Kopieer bytes vanaf offset tot grootte in de kernel met copy_file_range, met sendfile en
+    read/write als terugvalopties. Geeft het aantal gekopieerde bytes terug.
+    Param begrenzer: Optionele functie van Bandbreedte.begrenzer() die na elk blok wacht tot het tempo weer klopt"""
+    gekopieerd = 0
+    methode = 'copy_file_range' if hasattr(os, 'copy_file_range') else 'sendfile'
+    blok_grootte = KOPIEER_BLOK_GROOTTE if begrenzer is None else KOPIEER_BLOK_GROOTTE_BEGRENSD
+    while offset < grootte:
+        aantal = min(blok_grootte, grootte - offset)
+        try:
+            if methode == 'copy_file_range':
+                n = os.copy_file_range(bron_fd, doel_fd, aantal, offset, offset)
+            elif methode == 'sendfile':
+                os.lseek(doel_fd, offset, os.SEEK_SET)
+                n = os.sendfile(doel_fd, bron_fd, offset, aantal)
+            else:
+                data = os.pread(bron_fd, aantal, offset)
+                n = os.pwrite(doel_fd, data, offset) if data else 0
+        except OSError as e:
+            # Niet ondersteund tussen deze bestandssystemen: val terug op de volgende methode
+            if e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP) and methode != 'readwrite':
+                methode = 'sendfile' if methode == 'copy_file_range' and hasattr(os, 'sendfile') else 'readwrite'
+                continue
+            raise
+        if n == 0:
+            # Het bronbestand is korter geworden tijdens het kopiëren
+            raise OSError(errno.EIO, "Bronbestand is ingekort tijdens het kopiëren")
+        offset += n
+        gekopieerd += n
+        if begrenzer is not None:
+            # Achteraf betalen, zodat een mislukte poging met een andere methode niet dubbel telt
+            begrenzer(n)
+    return gekopieerd
+
+def kopieer_naar_tijdelijk(bron_pad, tijdelijk_pad, hervat=False, begrenzer=None):
+    """Kopieer een bestand naar de tijdelijke naam en fsync het resultaat.
+    De grootte komt uit een fstat van de geopende bron, niet uit de scan, zodat later toegevoegde
+    bytes worden meegekopieerd. Geeft die fstat terug om achteraf wijzigingen te herkennen.
+    Param hervat: Ga verder vanaf de huidige grootte van het tijdelijke bestand"""
+    with open(bron_pad, 'rb') as bron:
+        gekopieerd_stat = os.fstat(bron.fileno())
+        vlaggen = os.O_WRONLY | os.O_CREAT | (0 if hervat else os.O_TRUNC)
+        doel_fd = os.open(tijdelijk_pad, vlaggen, 0o644)
+        try:
+            offset = os.fstat(doel_fd).st_size if hervat else 0
+            if offset > gekopieerd_stat.st_size:
+                os.ftruncate(doel_fd, 0)
+                offset = 0
+            kopieer_bytes(bron.fileno(), doel_fd, offset, gekopieerd_stat.st_size, begrenzer)
+            os.fsync(doel_fd)
+        finally:
+            os.close(doel_fd)
+    shutil.copystat(bron_pad, tijdelijk_pad)
+    return gekopieerd_stat
+
+def bron_gewijzigd(bron_pad, gekopieerd_stat):
+    """Geef True terug als de bron sinds het begin van de kopie van grootte of mtime is veranderd."""
+    try:
+        huidig = os.stat(bron_pad)
+    except FileNotFoundError:
+        return True
+    return (huidig.st_size, huidig.st_mtime_ns) != (gekopieerd_stat.st_size, gekopieerd_stat.st_mtime_ns)
+
+def verplaats_bestand(bron_pad, doel_pad, journaal=None, bron_stat=None, hervat=False, begrenzer=None):
+    """Verplaats één bestand. Op dezelfde schijf met os.rename; tussen schijven via een kopie
+    naar een tijdelijke naam, fsync en een atomische rename, zodat een crash nooit een half
+    bestand onder de echte naam achterlaat."""
+    if bron_stat is None:
+        bron_stat = os.stat(bron_pad)
+    doelmap = os.path.dirname(doel_pad)
+    try:
+        doelmap_stat = os.stat(doelmap)
+    except FileNotFoundError:
+        # Submap onder de doelmap bij recursief scannen
+        os.makedirs(doelmap, exist_ok=True)
+        doelmap_stat = os.stat(doelmap)
+    
+    if bron_stat.st_dev == doelmap_stat.st_dev:
+        os.rename(bron_pad, doel_pad)
+        return
+    
+    tijdelijk_pad = tijdelijk_doel_pad(doel_pad)
+    if journaal is not None and not hervat:
+        journaal.begin(bron_pad, doel_pad, bron_stat)
+    try:
+        gekopieerd_stat = kopieer_naar_tijdelijk(bron_pad, tijdelijk_pad, hervat=hervat, begrenzer=begrenzer)
+        # Is er tijdens het kopiëren nog geschreven, dan blijft de bron staan en vervalt onze kopie;
+        # dat wordt vóór de rename gecontroleerd, zodat een onvolledige kopie nooit onder de echte naam staat
+        if bron_gewijzigd(bron_pad, gekopieerd_stat):
+            raise OSError(errno.EAGAIN, "Bronbestand is gewijzigd tijdens het kopiëren, bron blijft staan", bron_pad)
+        os.rename(tijdelijk_pad, doel_pad)
+        fsync_map(doelmap)
+    except Exception:
+        # Bij een gewone fout ruimen we de halve kopie op; bij een crash blijft hij staan voor hervatting
+        try:
+            os.unlink(tijdelijk_pad)
+        except OSError:
+            pass
+        if journaal is not None:
+            journaal.klaar(doel_pad)
+        raise
+    os.unlink(bron_pad)
+    fsync_map(os.path.dirname(bron_pad))
+    if journaal is not None:
+        journaal.klaar(doel_pad)
+
+# Koude start: seconden vanaf PROCES_START tot de eerste geslaagde verplaatsing van dit proces
+opstart_lock = threading.Lock()
+opstart = {'eerste_verplaatsing': None}
+
+def registreer_eerste_verplaatsing(config):
+    """Onthoud en meld eenmalig hoe lang het na de start van het proces duurde tot de eerste verplaatsing."""
+    with opstart_lock:
+        if opstart['eerste_verplaatsing'] is not None:
+            return
+        opstart['eerste_verplaatsing'] = time.monotonic() - PROCES_START
+    logboek_bericht(config, f"Eerste verplaatsing na {opstart['eerste_verplaatsing']:.3f} s sinds de start van het proces.", belangrijk=False)
+
+def herstel_onderbroken_verplaatsingen(config, journaal, coordinatie=None):
+    """Rond verplaatsingen af die door een crash of herstart zijn onderbroken.
+    Met coördinatie wordt elk bestand eerst geclaimd: na het verlopen van onze lease kan een andere instantie
+    het bestand hebben overgenomen en naar hetzelfde tijdelijke bestand kopiëren. Een geweigerde claim blijft
+    open in het journaal en wordt bij een volgende start opnieuw bekeken."""
+    if coordinatie is not None:
+        coordinatie.ververs()
+    for item in journaal.open_verplaatsingen():
+        bron_pad, doel_pad = item['bron'], item['doel']
+        tijdelijk_pad = tijdelijk_doel_pad(doel_pad)
+        naam = os.path.basename(doel_pad)
+        
+        # De claim hoort bij het relatieve pad onder de bronmap, net als bij het scannen
+        bestand = None
+        if coordinatie is not None and os.path.lexists(bron_pad):
+            bronmap = zoek_bronmap(config['source_paths'], bron_pad)
+            bestand = os.path.relpath(bron_pad, bronmap) if bronmap else os.path.basename(bron_pad)
+            if not coordinatie.claim(bestand):
+                logboek_bericht(config, f"  Overslaan bij herstel: {naam} wordt door een andere instantie verwerkt.", belangrijk=False)
+                continue
+        
+        try:
+            bron_stat = os.stat(bron_pad)
+        except FileNotFoundError:
+            bron_stat = None
+        
+        try:
+            if bron_stat is None:
+                # De bron is al verwijderd, dus de rename was al gelukt; ruim alleen nog restanten op
+                if os.path.exists(tijdelijk_pad) and os.path.exists(doel_pad):
+                    os.unlink(tijdelijk_pad)
+                journaal.klaar(doel_pad)
+            elif os.path.exists(doel_pad):
+                # Crash tussen de rename en het verwijderen van de bron; de kopie heeft de grootte en mtime van de bron
+                doel_stat = os.stat(doel_pad)
+                if (doel_stat.st_size, doel_stat.st_mtime_ns) == (bron_stat.st_size, bron_stat.st_mtime_ns):
+                    os.unlink(bron_pad)
+                    logboek_bericht(config, f"  Hersteld: {naam} was al gekopieerd, bron verwijderd.", belangrijk=False)
+                else:
+                    # Onze kopie klopt niet (meer) met de bron; de bron blijft staan en wordt opnieuw verplaatst
+                    os.unlink(doel_pad)
+                    fsync_map(os.path.dirname(doel_pad))
+                    logboek_bericht(config, f"  Hersteld: kopie van {naam} wijkt af van de bron en is verwijderd.", belangrijk=False)
+                journaal.klaar(doel_pad)
+            elif bron_stat.st_size == item['grootte'] and bron_stat.st_mtime_ns == item['mtime_ns']:
+                # De bron is ongewijzigd: ga verder waar de kopie was gebleven
+                logboek_bericht(config, f"  Hervatten van onderbroken kopie: {naam}", belangrijk=False)
+                verplaats_bestand(bron_pad, doel_pad, journaal, bron_stat, hervat=os.path.exists(tijdelijk_pad))
+            else:
+                # De bron is gewijzigd; de halve kopie is waardeloos
+                if os.path.exists(tijdelijk_pad):
+                    os.unlink(tijdelijk_pad)
+                journaal.klaar(doel_pad)
+        except Exception as e:
+            logboek_bericht(config, f"  Fout bij herstellen van onderbroken verplaatsing van {naam}: {e}", belangrijk=True, niveau='fout')
+        finally:
+            if bestand is not None:
+                coordinatie.vrijgeven(bestand)
+    journaal.compacteer()
+
+def maak_scan_teller():
+    """Maak een lege teller voor de scan-statistieken van een cyclus."""
+    return {
+        'mappen': 0,    # Aantal gescande mappen
+        'entries': 0,   # Aantal bekeken directory entries
+        'syscalls': 0   # Geschatte aantal stat/exists aanroepen (exclusief het lezen van de map zelf)
+    }
+
+def meet_iterator(iterator, fasen, fase):
+    """Geef de items van een iterator door en tel de tijd die het ophalen kost op bij fasen[fase]."""
+    iterator = iter(iterator)
+    while True:
+        begin = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            fasen[fase] += time.perf_counter() - begin
+            return
+        fasen[fase] += time.perf_counter() - begin
+        yield item
+
+def scan_bronmap(bronmap, scan_teller=None, submappen=None, bestanden=True):
+    """Doorloop een bronmap lazy met os.scandir.
+    Levert (naam, pad, stat_result) op voor elk regulier bestand. Het bestandstype komt
+    uit de gecachte DirEntry-gegevens, zodat er per bestand maar één stat-aanroep nodig is.
+    Param submappen: Optionele lijst waaraan de submappen worden toegevoegd (symlinks worden niet gevolgd)
+    Param bestanden: Met False worden alleen de submappen verzameld, zonder bestanden te stat'en"""
+    if scan_teller is None:
+        scan_teller = maak_scan_teller()
+    
+    scan_teller['mappen'] += 1
+    scan_teller['syscalls'] += 1  # opendir
+    
+    with os.scandir(bronmap) as entries:
+        for entry in entries:
+            scan_teller['entries'] += 1
+            try:
+                # is_file() gebruikt d_type uit de map zelf; alleen bij onbekend type of symlinks is er een extra stat nodig
+                if not entry.is_file():
+                    if submappen is not None and entry.is_dir(follow_symlinks=False):
+                        submappen.append(entry.path)
+                    continue
+                if not bestanden:
+                    continue
+                scan_teller['syscalls'] += 1
+                bestand_stat = entry.stat()
+            except OSError:
+                # Het bestand is tussen het lezen van de map en de stat verdwenen
+                continue
+            yield entry.name, entry.path, bestand_stat
+
+def scan_bestanden(paden, scan_teller=None):
+    """Stat een vaste lijst bestanden (bijvoorbeeld bestanden waarvan de deadline is verstreken).
+    Levert dezelfde (naam, pad, stat_result) tuples op als scan_bronmap."""
+    if scan_teller is None:
+        scan_teller = maak_scan_teller()
+    
+    for pad in paden:
+        scan_teller['entries'] += 1
+        scan_teller['syscalls'] += 1
+        try:
+            bestand_stat = os.stat(pad)
+        except OSError:
+            # Het bestand is inmiddels verplaatst of verwijderd
+            continue
+        if not stat.S_ISREG(bestand_stat.st_mode):
+            continue
+        yield os.path.basename(pad), pad, bestand_stat
+
+def maak_deadline_planner():
+    """Maak een planner die bijhoudt wanneer te nieuwe bestanden oud genoeg worden.
+    De heap bevat (deadline, pad, bronmap); 'bekend' bevat de actuele deadline per pad zodat
+    verouderde heap-items bij het uitlezen kunnen worden overgeslagen."""
+    return {
+        'lock': threading.Lock(),
+        'heap': [],
+        'bekend': {}
+    }
+
+def plan_deadline(planner, deadline, pad, bronmap):
+    """Plan een bestand in. Geeft False terug als het bestand al met dezelfde deadline bekend was."""
+    with planner['lock']:
+        if planner['bekend'].get(pad) == deadline:
+            return False
+        planner['bekend'][pad] = deadline
+        heapq.heappush(planner['heap'], (deadline, pad, bronmap))
+        return True
+
+def volgende_deadline(planner):
+    """Geef het vroegste geldige deadline-tijdstip terug, of None als er niets gepland is."""
+    with planner['lock']:
+        heap = planner['heap']
+        # Ruim verouderde items bovenaan de heap op
+        while heap and planner['bekend'].get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+def haal_verlopen_deadlines(planner, nu):
+    """Haal alle bestanden op waarvan de deadline is verstreken, gegroepeerd per bronmap."""
+    verlopen = {}
+    with planner['lock']:
+        heap = planner['heap']
+        while heap and heap[0][0] <= nu:
+            deadline, pad, bronmap = heapq.heappop(heap)
+            if planner['bekend'].get(pad) != deadline:
+                continue
+            del planner['bekend'][pad]
+            verlopen.setdefault(bronmap, []).append(pad)
+    return verlopen
+
+DOORVOER_GEWICHT = 0.3  # Gewicht van de nieuwste cyclus in het gemiddelde van de gemeten doorvoer
+
+# Instellingen waarvan de beslissingen in de index afhangen; een wijziging maakt de index ongeldig
+BESLIS_INSTELLINGEN = ('minimum_leeftijd_uren', 'recursief', 'max_diepte', 'stabiel_seconden',
+                       'open_bestanden_controleren', 'destination_path', 'extra_destination_paths',
+                       'deduplicatie', 'conflict_afhandeling', 'quarantaine_map')
+
+def beslis_vingerafdruk(config):
+    """Geef de instellingen die beslissingen bepalen als vaste tekst terug, om ze met de index te vergelijken."""
+    standaard = maak_standaard_configuratie()
+    return json.dumps({sleutel: config.get(sleutel, standaard.get(sleutel)) for sleutel in BESLIS_INSTELLINGEN}, sort_keys=True)
+
+def get_index_bestand_pad(config=None):
+    """Bepaal het pad naar de scan index, naast het configuratiebestand."""
+    return toestand_bestand_pad(config, 'reverseraid.index', 'sqlite')
+
+def map_stand(pad):
+    """Geef (inode, mtime in ns) van een map terug, of None als de map niet bestaat."""
+    try:
+        map_stat = os.stat(pad)
+    except OSError:
+        return None
+    return (map_stat.st_ino, map_stat.st_mtime_ns)
+
+def apparaat_van(pad):
+    """Geef het apparaat (st_dev) van een pad terug, of None als het pad niet bestaat."""
+    try:
+        return os.stat(pad).st_dev
+    except OSError:
+        return None
+
+class ScanIndex:
+    """Persistente index van eerdere beslissingen per bestand.
+    Bestanden worden herkend aan pad, inode, grootte en mtime; een bronmap waarvan de inode en
+    mtime niet zijn veranderd hoeft niet opnieuw te worden gescand."""
+    
+    def __init__(self, pad):
+        self.pad = pad
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(pad, check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS bestanden (
+                pad TEXT PRIMARY KEY,
+                bronmap TEXT NOT NULL,
+                inode INTEGER NOT NULL,
+                grootte INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                beslissing TEXT NOT NULL,
+                geschikt_vanaf REAL
+            )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS bestanden_bronmap ON bestanden (bronmap)")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS mappen (
+                pad TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            )""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                apparaat INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                grootte INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (apparaat, inode, grootte, mtime_ns)
+            )""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS instellingen (
+                sleutel TEXT PRIMARY KEY,
+                waarde TEXT NOT NULL
+            )""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS doorvoer (
+                apparaat INTEGER NOT NULL,
+                doelmap TEXT NOT NULL,
+                bytes_per_seconde REAL NOT NULL,
+                bijgewerkt REAL NOT NULL,
+                PRIMARY KEY (apparaat, doelmap)
+            )""")
+    
+    def map_ongewijzigd(self, pad, stand):
+        """Controleer of een map sinds de vorige scan dezelfde inode en mtime heeft."""
+        with self.lock:
+            rij = self.db.execute("SELECT inode, mtime_ns FROM mappen WHERE pad = ?", (pad,)).fetchone()
+        return stand is not None and rij is not None and tuple(rij) == stand
+    
+    def zet_map_stand(self, pad, stand):
+        """Sla de inode en mtime van een map op na een scan."""
+        if stand is None:
+            return
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO mappen (pad, inode, mtime_ns) VALUES (?, ?, ?)", (pad, *stand))
+    
+    def doel_submap_standen(self, doelmap):
+        """Geef (pad, stand) van de gevolgde submappen onder een doelmap."""
+        prefix = doelmap.rstrip(os.sep) + os.sep
+        with self.lock:
+            rijen = self.db.execute("SELECT pad, inode, mtime_ns FROM mappen WHERE substr(pad, 1, ?) = ?",
+                                    (len(prefix), prefix)).fetchall()
+        return [(pad, (inode, mtime_ns)) for pad, inode, mtime_ns in rijen]
+    
+    def controleer_doelmap(self, doelmap):
+        """Vergeet alle 'bestaat al' beslissingen als de doelmap of een van de gevolgde submappen buiten
+        ons om is gewijzigd. Bij recursief scannen verandert het verwijderen van doelmap/sub/a.bin
+        alleen de mtime van doelmap/sub. Geeft True terug als de index daardoor is ongeldig gemaakt."""
+        stand = map_stand(doelmap)
+        if self.map_ongewijzigd(doelmap, stand) and all(map_stand(pad) == submap_stand for pad, submap_stand in self.doel_submap_standen(doelmap)):
+            return False
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM bestanden WHERE beslissing = 'bestaat_al'")
+            self.db.execute("DELETE FROM mappen")
+        return True
+    
+    def controleer_instellingen(self, vingerafdruk):
+        """Vergeet alle beslissingen en mapstanden als de instellingen die beslissingen bepalen zijn gewijzigd.
+        Geeft True terug als de index daardoor is ongeldig gemaakt."""
+        with self.lock, self.db:
+            rij = self.db.execute("SELECT waarde FROM instellingen WHERE sleutel = 'vingerafdruk'").fetchone()
+            if rij is not None and rij[0] == vingerafdruk:
+                return False
+            self.db.execute("DELETE FROM bestanden")
+            self.db.execute("DELETE FROM mappen")
+            self.db.execute("INSERT OR REPLACE INTO instellingen VALUES ('vingerafdruk', ?)", (vingerafdruk,))
+        return rij is not None
     
-    # Zorg ervoor dat de doelmap bestaat
-    os.makedirs(doelmap, exist_ok=True)
+    def beslissingen(self, bronmap):
+        """Geef de bewaarde beslissingen van een bronmap terug als dict pad -> (inode, grootte, mtime_ns, beslissing)."""
+        with self.lock:
+            rijen = self.db.execute(
+                "SELECT pad, inode, grootte, mtime_ns, beslissing FROM bestanden WHERE bronmap = ?", (bronmap,)).fetchall()
+        return {rij[0]: tuple(rij[1:]) for rij in rijen}
     
-    # Bereken de tijdsgrens (minimale leeftijd in uren geleden)
-    tijdsgrens = time.time() - (minimum_leeftijd * 60 * 60)  # Uren naar seconden
-    huidig_tijdstip = datetime.now()
-    tijdsgrens_datetime = huidig_tijdstip - timedelta(hours=minimum_leeftijd)
+    def vervang_map(self, bronmap, rijen):
+        """Vervang alle beslissingen van een bronmap na een volledige scan."""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM bestanden WHERE bronmap = ?", (bronmap,))
+            self.db.executemany("INSERT OR REPLACE INTO bestanden VALUES (?, ?, ?, ?, ?, ?, ?)", rijen)
     
-    totaal_bestanden = 0
-    totaal_verplaatst = 0
-    totaal_overgeslagen_te_nieuw = 0
+    def vervang_bestanden(self, paden, rijen):
+        """Vervang de beslissingen van een aantal opnieuw bekeken bestanden."""
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM bestanden WHERE pad = ?", ((pad,) for pad in paden))
+            self.db.executemany("INSERT OR REPLACE INTO bestanden VALUES (?, ?, ?, ?, ?, ?, ?)", rijen)
     
-    logboek_bericht(config, f"Begin met verplaatsen van bestanden (alleen bestanden ouder dan {minimum_leeftijd} uur)...")
+    def haal_hash(self, sleutel):
+        """Zoek een eerder berekende hash op voor (apparaat, inode, grootte, mtime_ns)."""
+        with self.lock:
+            rij = self.db.execute(
+                "SELECT hash FROM hashes WHERE apparaat = ? AND inode = ? AND grootte = ? AND mtime_ns = ?", sleutel).fetchone()
+        return rij[0] if rij else None
     
-    # Loop door alle bronmappen
-    for i, bronmap in enumerate(config['source_paths']):
-        if not os.path.isdir(bronmap):
-            logboek_bericht(config, f"Overslaan van bronmap {i+1}: Map bestaat niet of is geen map.", belangrijk=True)
+    def bewaar_hash(self, sleutel, waarde):
+        """Bewaar een berekende hash voor (apparaat, inode, grootte, mtime_ns)."""
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", (*sleutel, waarde))
+    
+    def bewaar_doorvoer(self, metingen):
+        """Werk de gemeten doorvoer per (bronschijf, doelmap) bij met een voortschrijdend gemiddelde.
+        Param metingen: dict (apparaat, doelmap) -> [bytes, seconden] van één cyclus"""
+        with self.lock, self.db:
+            for (apparaat, doelmap), (aantal_bytes, seconden) in metingen.items():
+                if seconden <= 0 or aantal_bytes <= 0:
+                    continue
+                gemeten = aantal_bytes / seconden
+                rij = self.db.execute("SELECT bytes_per_seconde FROM doorvoer WHERE apparaat = ? AND doelmap = ?", (apparaat, doelmap)).fetchone()
+                if rij is not None:
+                    gemeten = rij[0] * (1 - DOORVOER_GEWICHT) + gemeten * DOORVOER_GEWICHT
+                self.db.execute("INSERT OR REPLACE INTO doorvoer VALUES (?, ?, ?, ?)", (apparaat, doelmap, gemeten, time.time()))
+    
+    def haal_doorvoer(self):
+        """Geef de bewaarde doorvoer terug als dict (apparaat, doelmap) -> bytes per seconde."""
+        with self.lock:
+            rijen = self.db.execute("SELECT apparaat, doelmap, bytes_per_seconde FROM doorvoer").fetchall()
+        return {(rij[0], rij[1]): rij[2] for rij in rijen}
+    
+    def te_nieuwe_bestanden(self):
+        """Geef (geschikt_vanaf, pad, bronmap) terug voor alle bestanden die nog te nieuw of niet stabiel waren."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT geschikt_vanaf, pad, bronmap FROM bestanden WHERE beslissing IN ('te_nieuw', 'onstabiel')").fetchall()
+    
+    def onstabiele_bestanden(self):
+        """Geef (pad, grootte, mtime_ns, geschikt_vanaf) terug voor de bestanden die nog niet stabiel waren."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT pad, grootte, mtime_ns, geschikt_vanaf FROM bestanden WHERE beslissing = 'onstabiel'").fetchall()
+    
+    def sluit(self):
+        """Sluit de database."""
+        with self.lock:
+            self.db.close()
+
+def open_scan_index(config):
+    """Open de scan index als deze is ingeschakeld. Geeft None terug als dat niet lukt."""
+    if not config.get('scan_index', True):
+        return None
+    try:
+        return ScanIndex(get_index_bestand_pad(config))
+    except sqlite3.Error as e:
+        logboek_bericht(config, f"Scan index kan niet worden geopend ({e}), doorgaan zonder index.", belangrijk=False)
+        return None
+
+def zoek_bronmap(bronmappen, pad):
+    """Geef de bronmap terug waarin pad ligt (de diepste bij geneste bronmappen), of None."""
+    pad = os.path.normpath(pad)
+    gevonden = None
+    for bronmap in bronmappen:
+        if not bronmap:
             continue
+        wortel = os.path.normpath(bronmap)
+        if (pad == wortel or pad.startswith(wortel.rstrip(os.sep) + os.sep)) and (gevonden is None or len(wortel) > len(os.path.normpath(gevonden))):
+            gevonden = bronmap
+    return gevonden
+
+def laad_deadlines_uit_index(index, planner, bronmappen=None):
+    """Zet de te nieuwe en nog niet stabiele bestanden uit de index na een herstart terug in de deadline planner.
+    De index bewaart de map van elk bestand; bij recursief scannen is dat een submap, terwijl de
+    planner per bronmap groepeert."""
+    for geschikt_vanaf, pad, bronmap in index.te_nieuwe_bestanden():
+        if bronmappen:
+            bronmap = zoek_bronmap(bronmappen, bronmap) or bronmap
+        plan_deadline(planner, geschikt_vanaf, pad, bronmap)
+
+class DoelBalancer:
+    """Verdeelt verplaatsingen over de doelmappen volgens het plaatsingsbeleid.
+    De vrije ruimte komt uit os.statvfs en wordt één keer per cyclus ververst; ruimte voor lopende
+    verplaatsingen wordt gereserveerd zodat parallelle workers een schijf niet kunnen overvullen."""
+    
+    def __init__(self, doelmappen, beleid='meeste_vrije_ruimte', reserve_bytes=0):
+        self.lock = threading.Lock()
+        self.beleid = beleid
+        self.reserve_bytes = reserve_bytes
+        self.volgende = 0
+        self.doelen = {}
+        self.stel_doelmappen_in(doelmappen)
+    
+    def stel_doelmappen_in(self, doelmappen):
+        """Werk de lijst doelmappen bij; gemeten doorvoer van bestaande doelmappen blijft behouden."""
+        with self.lock:
+            self.volgorde = list(doelmappen)
+            self.doelen = {pad: self.doelen.get(pad, {'vrij': 0, 'gereserveerd': 0, 'doorvoer': 0.0, 'vol': False})
+                           for pad in self.volgorde}
+    
+    def ververs(self):
+        """Lees de vrije ruimte van alle doelmappen opnieuw uit. Een volle doelmap komt pas terug als er weer ruimte is."""
+        for pad in self.volgorde:
+            try:
+                vfs = os.statvfs(pad)
+                vrij = vfs.f_bavail * vfs.f_frsize
+            except OSError:
+                vrij = 0
+            with self.lock:
+                doel = self.doelen[pad]
+                doel['vrij'] = vrij
+                doel['vol'] = vrij - doel['gereserveerd'] <= self.reserve_bytes
+    
+    def beschikbaar(self, pad):
+        """Vrije ruimte van een doelmap na aftrek van reserveringen en de minimale vrije ruimte."""
+        doel = self.doelen[pad]
+        return doel['vrij'] - doel['gereserveerd'] - self.reserve_bytes
+    
+    def kies(self, grootte):
+        """Kies een doelmap voor een bestand van grootte bytes en reserveer de ruimte.
+        Geeft None terug als geen enkele doelmap genoeg ruimte heeft."""
+        with self.lock:
+            kandidaten = [pad for pad in self.volgorde
+                          if not self.doelen[pad]['vol'] and self.beschikbaar(pad) >= grootte]
+            if not kandidaten:
+                return None
+            
+            if self.beleid == 'round_robin':
+                # Neem de eerstvolgende doelmap in de vaste volgorde die nog ruimte heeft
+                for stap in range(len(self.volgorde)):
+                    pad = self.volgorde[(self.volgende + stap) % len(self.volgorde)]
+                    if pad in kandidaten:
+                        self.volgende = (self.volgorde.index(pad) + 1) % len(self.volgorde)
+                        gekozen = pad
+                        break
+            elif self.beleid == 'gewogen_doorvoer':
+                # Kies de doelmap die dit bestand naar verwachting het eerst af heeft,
+                # gegeven de lopende verplaatsingen en de gemeten doorvoer
+                def verwachte_klaar_tijd(pad):
+                    doorvoer = self.doelen[pad]['doorvoer']
+                    if not doorvoer:
+                        # Nog niet gemeten: eerst proberen zodat er een meting komt
+                        return 0.0
+                    return (self.doelen[pad]['gereserveerd'] + grootte) / doorvoer
+                gekozen = min(kandidaten, key=verwachte_klaar_tijd)
+            else:
+                gekozen = max(kandidaten, key=self.beschikbaar)
+            
+            self.doelen[gekozen]['gereserveerd'] += grootte
+            return gekozen
+    
+    def vrijgeven(self, pad, grootte, gelukt, duur=None):
+        """Geef de reservering vrij na een verplaatsing en werk de geschatte vrije ruimte en doorvoer bij."""
+        with self.lock:
+            doel = self.doelen.get(pad)
+            if doel is None:
+                return
+            doel['gereserveerd'] -= grootte
+            if gelukt:
+                doel['vrij'] -= grootte
+                if duur and grootte:
+                    # Exponentieel voortschrijdend gemiddelde van de doorvoer in bytes per seconde
+                    meting = grootte / duur
+                    doel['doorvoer'] = meting if not doel['doorvoer'] else 0.8 * doel['doorvoer'] + 0.2 * meting
+    
+    def markeer_vol(self, pad):
+        """Sla een doelmap over tot de volgende verversing weer ruimte laat zien (bijvoorbeeld na ENOSPC)."""
+        with self.lock:
+            if pad in self.doelen:
+                self.doelen[pad]['vol'] = True
+                self.doelen[pad]['vrij'] = 0
+    
+    def volle_doelmappen(self):
+        """Geef de doelmappen die op dit moment als vol zijn gemarkeerd."""
+        with self.lock:
+            return [pad for pad in self.volgorde if self.doelen[pad]['vol']]
+
+def maak_doel_balancer(config):
+    """Maak een DoelBalancer voor de doelmappen en het plaatsingsbeleid uit de configuratie."""
+    return DoelBalancer(get_doelmappen(config),
+                        beleid=config.get('plaatsingsbeleid', 'meeste_vrije_ruimte'),
+                        reserve_bytes=int(config.get('minimale_vrije_ruimte_mb', 1024) * 1024 * 1024))
+
+def bestaat_in_doelmappen(doelmappen, bestand):
+    """Controleer of een bestand met deze naam al in een van de doelmappen staat."""
+    return any(os.path.exists(os.path.join(doelmap, bestand)) for doelmap in doelmappen)
+
+COORDINATIE_MAP = '.reverseraid'  # Map onder destination_path met de leases en claims van alle instanties
+
+def standaard_instantie_id():
+    """Geef een instantie id dat uniek is per host en proces."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class Coordinatie:
+    """Verdeelt het werk tussen instanties die dezelfde bronnen leeghalen, via bestanden onder de doelmap.
+    Elke instantie houdt een lease bij in instanties/<id>.lease; een lease die langer dan lease_seconden niet
+    is vernieuwd hoort bij een gestopte instantie. Bestanden (of hele bronmappen) worden met rendezvous
+    hashing over de levende instanties verdeeld, zodat het werk van een gestopte instantie vanzelf naar de
+    overige instanties gaat. Omdat twee instanties kort een verschillend beeld kunnen hebben, wordt elk
+    bestand vóór het verplaatsen nog geclaimd met een O_EXCL bestand in claims/.
+    Met alleen_lezen wordt alleen de verdeling bepaald, zonder eigen lease en zonder verlopen leases op te ruimen."""
+    
+    def __init__(self, doelmap, instantie_id=None, lease_seconden=60, verdeling='bestanden', alleen_lezen=False):
+        self.map = os.path.join(doelmap, COORDINATIE_MAP)
+        self.instanties_map = os.path.join(self.map, 'instanties')
+        self.claims_map = os.path.join(self.map, 'claims')
+        self.id = (instantie_id or standaard_instantie_id()).replace(os.sep, '_')
+        self.lease_seconden = lease_seconden
+        self.verdeling = verdeling
+        self.alleen_lezen = alleen_lezen
+        # Onderscheidt dit proces van een eerder proces met hetzelfde instantie_id (bijvoorbeeld na een crash)
+        self.token = f"{socket.gethostname()}-{os.getpid()}-{time.time():.6f}"
+        self.lease_pad = os.path.join(self.instanties_map, f"{self.id}.lease")
+        self.lock = threading.Lock()
+        self.instanties = [self.id]
+        self.stop_event = threading.Event()
+        self.thread = None
+        if alleen_lezen:
+            return
+        os.makedirs(self.instanties_map, exist_ok=True)
+        os.makedirs(self.claims_map, exist_ok=True)
+        self.vernieuw()
+        
+        # Vernieuw de lease ook tijdens een lange cyclus, zodat andere instanties ons werk niet overnemen
+        self.thread = threading.Thread(target=self._hartslag, name='lease', daemon=True)
+        self.thread.start()
+    
+    def _hartslag(self):
+        while not self.stop_event.wait(max(1.0, self.lease_seconden / 3)):
+            try:
+                self.vernieuw()
+            except OSError as e:
+                print(f"Fout bij vernieuwen van de lease: {e}")
+    
+    def vernieuw(self):
+        """Schrijf de eigen lease atomisch opnieuw weg."""
+        tijdelijk = self.lease_pad + '.tmp'
+        with open(tijdelijk, 'w') as f:
+            json.dump({'instantie': self.id, 'host': socket.gethostname(), 'pid': os.getpid(), 'tijd': time.time()}, f)
+        os.replace(tijdelijk, self.lease_pad)
+    
+    def ververs(self):
+        """Vernieuw de eigen lease en lees de levende instanties in; verlopen leases worden opgeruimd.
+        Het beeld geldt voor de hele cyclus. Geeft de verlopen instanties terug."""
+        if not self.alleen_lezen:
+            self.vernieuw()
+        nu = time.time()
+        levend, verlopen = {self.id}, []
+        try:
+            namen = os.listdir(self.instanties_map)
+        except FileNotFoundError:
+            namen = []  # Alleen lezen en nog nooit een instantie gestart
+        for naam in namen:
+            if not naam.endswith('.lease'):
+                continue
+            pad = os.path.join(self.instanties_map, naam)
+            try:
+                with open(pad, 'r') as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                # Verdwenen of half geschreven door een andere host; de volgende cyclus telt hij weer mee
+                continue
+            if nu - lease.get('tijd', 0) <= self.lease_seconden:
+                levend.add(lease.get('instantie', naam[:-len('.lease')]))
+            else:
+                verlopen.append(lease.get('instantie', naam))
+                if self.alleen_lezen:
+                    continue
+                try:
+                    os.unlink(pad)
+                except OSError:
+                    pass
+        with self.lock:
+            self.instanties = sorted(levend)
+        return verlopen
+    
+    def eigenaar(self, sleutel):
+        """Geef de instantie die volgens rendezvous hashing verantwoordelijk is voor sleutel."""
+        with self.lock:
+            instanties = self.instanties
+        if len(instanties) == 1:
+            return instanties[0]
+        return max(instanties, key=lambda instantie: hashlib.blake2b(f"{instantie}\0{sleutel}".encode('utf-8', 'surrogateescape'), digest_size=8).digest())
+    
+    def is_eigen_bestand(self, bestand):
+        """Geef True als dit bestand door deze instantie verwerkt hoort te worden."""
+        return self.verdeling != 'bestanden' or self.eigenaar(bestand) == self.id
+    
+    def is_eigen_bronmap(self, bronmap):
+        """Geef True als deze bronmap door deze instantie gescand hoort te worden."""
+        return self.verdeling != 'bronmappen' or self.eigenaar(os.path.normpath(bronmap)) == self.id
+    
+    def claim_pad(self, bestand):
+        """Claims staan plat in één map, op naam van een hash van het relatieve doelpad."""
+        return os.path.join(self.claims_map, hashlib.blake2b(bestand.encode('utf-8', 'surrogateescape'), digest_size=16).hexdigest() + '.claim')
+    
+    def claim(self, bestand):
+        """Claim een bestand met O_EXCL. Een claim van een instantie zonder geldige lease wordt overgenomen.
+        Geeft True terug als deze instantie het bestand nu exclusief heeft."""
+        pad = self.claim_pad(bestand)
+        for _ in range(2):
+            try:
+                fd = os.open(pad, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                if not self._neem_verlopen_claim_over(pad):
+                    return False
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'instantie': self.id, 'token': self.token, 'bestand': bestand, 'tijd': time.time()}, f)
+            return True
+        return False
+    
+    def _neem_verlopen_claim_over(self, pad):
+        """Ruim een claim op van een instantie die niet meer leeft. Geeft True terug als de claim weg is.
+        Een claim met ons eigen id maar een ander token is van een vorig proces van deze instantie en dus ook verlopen."""
+        try:
+            with open(pad, 'r') as f:
+                claim = json.load(f)
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError):
+            # Wordt op dit moment nog geschreven
+            return False
+        if claim.get('instantie') == self.id:
+            if claim.get('token') == self.token:
+                return False
+        else:
+            with self.lock:
+                levend = claim.get('instantie') in self.instanties
+            if levend or time.time() - claim.get('tijd', 0) <= self.lease_seconden:
+                return False
+        
+        # Hernoem de claim naar een eigen naam: van meerdere instanties die hem tegelijk overnemen lukt dat er één
+        graf = f"{pad}.{self.id}.verlopen"
+        try:
+            os.rename(pad, graf)
+        except FileNotFoundError:
+            return True
+        try:
+            with open(graf, 'r') as f:
+                overgenomen = json.load(f)
+        except (OSError, ValueError):
+            overgenomen = None
+        if overgenomen != claim:
+            # Tussen lezen en hernoemen is de claim vernieuwd door een levende instantie; zet hem terug
+            try:
+                os.link(graf, pad)
+            except OSError:
+                pass
+            os.unlink(graf)
+            return False
+        os.unlink(graf)
+        return True
+    
+    def neem(self, bestand, bron_pad, doelmappen=None):
+        """Claim een bestand en controleer daarna opnieuw of het nog te verplaatsen is.
+        Geeft None terug als het bestand geclaimd is, anders de reden: 'bezet', 'weg' of 'bestaat_al'."""
+        if not self.claim(bestand):
+            return 'bezet'
+        # Een andere instantie kan het bestand tussen onze scan en de claim al hebben verplaatst
+        if not os.path.lexists(bron_pad):
+            reden = 'weg'
+        elif doelmappen is not None and bestaat_in_doelmappen(doelmappen, bestand):
+            reden = 'bestaat_al'
+        else:
+            return None
+        self.vrijgeven(bestand)
+        return reden
+    
+    def vrijgeven(self, bestand):
+        """Verwijder de claim van een bestand."""
+        try:
+            os.unlink(self.claim_pad(bestand))
+        except FileNotFoundError:
+            pass
+    
+    def stop(self):
+        """Stop de hartslag en verwijder de eigen lease, zodat het werk direct wordt herverdeeld."""
+        self.stop_event.set()
+        if self.thread is None:
+            return
+        self.thread.join(timeout=5)
+        try:
+            os.unlink(self.lease_pad)
+        except OSError:
+            pass
+
+def maak_coordinatie(config, alleen_lezen=False):
+    """Maak de coördinatie tussen instanties als die is ingeschakeld.
+    Zonder werkende coördinatie zouden instanties elkaars bestanden kunnen verplaatsen, dus dan stopt het programma.
+    Param alleen_lezen: Alleen de verdeling over de levende instanties bepalen (voor een droge run)"""
+    if not config.get('coordinatie', False):
+        return None
+    try:
+        return Coordinatie(config['destination_path'],
+                           instantie_id=config.get('instantie_id', ''),
+                           lease_seconden=config.get('lease_seconden', 60),
+                           verdeling=config.get('coordinatie_verdeling', 'bestanden'),
+                           alleen_lezen=alleen_lezen)
+    except OSError as e:
+        logboek_bericht(config, f"Coördinatie kan niet worden gestart: {e}", belangrijk=True, niveau='fout')
+        sys.exit(EXIT_CONFIG)
+
+HASH_BLOK_GROOTTE = 1024 * 1024  # Bytes per gelezen blok bij het hashen
+
+class HashCache:
+    """Cache van BLAKE2 hashes, gesleuteld op (apparaat, inode, grootte, mtime_ns) zodat grote
+    bestanden maar één keer worden gehasht. Met een scan index blijven de hashes over herstarts bewaard."""
+    
+    def __init__(self, index=None, max_items=100000):
+        self.index = index
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.items = collections.OrderedDict()
+    
+    def haal(self, sleutel):
+        with self.lock:
+            if sleutel in self.items:
+                self.items.move_to_end(sleutel)
+                return self.items[sleutel]
+        if self.index is not None:
+            waarde = self.index.haal_hash(sleutel)
+            if waarde is not None:
+                self._onthoud(sleutel, waarde)
+            return waarde
+        return None
+    
+    def bewaar(self, sleutel, waarde):
+        self._onthoud(sleutel, waarde)
+        if self.index is not None:
+            self.index.bewaar_hash(sleutel, waarde)
+    
+    def _onthoud(self, sleutel, waarde):
+        with self.lock:
+            self.items[sleutel] = waarde
+            self.items.move_to_end(sleutel)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+def neem_hash_budget(cyclus, aantal, schuld=False):
+    """Neem aantal bytes van het hash-budget van deze cyclus. Geeft False terug als het budget op is.
+    De eerste hash van een cyclus past altijd, zodat een bestand dat groter is dan het budget niet
+    elke cyclus opnieuw wordt uitgesteld. Met schuld mag het budget negatief worden, om een begonnen
+    vergelijking af te maken."""
+    with cyclus['lock']:
+        if not schuld and cyclus['hash_gestart'] > 0 and cyclus['hash_budget'] < aantal:
+            return False
+        cyclus['hash_budget'] -= aantal
+        cyclus['hash_gestart'] += 1
+        return True
+
+def bestand_hash(cyclus, pad, bestand_stat, schuld=False):
+    """Geef de BLAKE2b hash van een bestand, uit de cache of berekend in blokken.
+    Geeft None terug als het hash-budget van de cyclus daarvoor niet meer toereikend is."""
+    sleutel = (bestand_stat.st_dev, bestand_stat.st_ino, bestand_stat.st_size, bestand_stat.st_mtime_ns)
+    waarde = cyclus['hash_cache'].haal(sleutel)
+    if waarde is not None:
+        return waarde
+    if not neem_hash_budget(cyclus, bestand_stat.st_size, schuld):
+        return None
+    
+    hasher = hashlib.blake2b(digest_size=32)
+    with open(pad, 'rb') as f:
+        while True:
+            blok = f.read(HASH_BLOK_GROOTTE)
+            if not blok:
+                break
+            hasher.update(blok)
+    waarde = hasher.hexdigest()
+    cyclus['hash_cache'].bewaar(sleutel, waarde)
+    return waarde
+
+def hash_naam(bestand, waarde):
+    """Geef een deterministische alternatieve naam op basis van de inhoud, bijvoorbeeld 'film.3fa9c1d2e4b5.mkv'."""
+    stam, extensie = os.path.splitext(bestand)
+    return f"{stam}.{waarde[:12]}{extensie}"
+
+def zoek_in_doelmappen(doelmappen, bestand):
+    """Geef het pad van het bestand in de eerste doelmap waarin het voorkomt, of None."""
+    for doelmap in doelmappen:
+        pad = os.path.join(doelmap, bestand)
+        if os.path.exists(pad):
+            return pad
+    return None
+
+def los_botsing_op(config, cyclus, bronmap, bestand, bron_pad, bestand_stat):
+    """Los een naambotsing met de doelmap op. Eerst wordt de grootte vergeleken, daarna de inhoud.
+    Een echt duplicaat wordt uit de bron verwijderd; bij andere inhoud volgt conflict_afhandeling.
+    Geeft 'duplicaat', 'verplaatst', 'bestaat_al' (overgeslagen) of 'uitgesteld' (hash-budget op) terug."""
+    doelmappen = cyclus['doelmappen']
+    doel_pad = zoek_in_doelmappen(doelmappen, bestand)
+    if doel_pad is None:
+        # Het doelbestand is inmiddels verdwenen; de volgende cyclus verplaatst het gewoon
+        return 'uitgesteld'
+    doel_stat = os.stat(doel_pad)
+    
+    bron_hash = None
+    if doel_stat.st_size == bestand_stat.st_size:
+        bron_hash = bestand_hash(cyclus, bron_pad, bestand_stat)
+        # De bron is al gehasht; de doelkant mag het budget overschrijden zodat die hash niet verloren gaat
+        doel_hash = bestand_hash(cyclus, doel_pad, doel_stat, schuld=True) if bron_hash is not None else None
+        if doel_hash is None:
+            return 'uitgesteld'
+        if bron_hash == doel_hash:
+            os.unlink(bron_pad)
+            logboek_bericht(config, f"  Duplicaat verwijderd uit bron: {bestand} is identiek aan {doel_pad}", belangrijk=False, niveau='debug', gebeurtenis='duplicaat')
+            return 'duplicaat'
+    
+    afhandeling = config.get('conflict_afhandeling', 'overslaan')
+    if afhandeling == 'overslaan':
+        logboek_bericht(config, f"  Overslaan: {bestand} bestaat al in de doelmap met andere inhoud.", belangrijk=False, niveau='debug', gebeurtenis='conflict')
+        return 'bestaat_al'
+    
+    if bron_hash is None:
+        bron_hash = bestand_hash(cyclus, bron_pad, bestand_stat)
+        if bron_hash is None:
+            return 'uitgesteld'
+    nieuwe_naam = hash_naam(bestand, bron_hash)
+    
+    if afhandeling == 'quarantaine':
+        quarantaine_map = config['quarantaine_map']
+        os.makedirs(quarantaine_map, exist_ok=True)
+        doel = os.path.join(quarantaine_map, bestand)
+        if os.path.exists(doel):
+            doel = os.path.join(quarantaine_map, nieuwe_naam)
+        if os.path.exists(doel):
+            # Dezelfde inhoud staat al in quarantaine
+            os.unlink(bron_pad)
+            logboek_bericht(config, f"  Duplicaat verwijderd uit bron: {bestand} staat al in quarantaine.", belangrijk=False, niveau='debug', gebeurtenis='duplicaat')
+            return 'duplicaat'
+        verplaats_bestand(bron_pad, doel, cyclus['journaal'], bestand_stat,
+                          begrenzer=cyclus['bandbreedte'].begrenzer(bronmap, quarantaine_map))
+        logboek_bericht(config, f"  Conflict: {bestand} verplaatst naar quarantaine als {os.path.basename(doel)}", belangrijk=True, niveau='waarschuwing', gebeurtenis='conflict')
+        return 'verplaatst'
+    
+    # Hernoemen: de naam bevat de hash, dus een bestaand bestand met die naam heeft dezelfde inhoud
+    if zoek_in_doelmappen(doelmappen, nieuwe_naam) is not None:
+        os.unlink(bron_pad)
+        logboek_bericht(config, f"  Duplicaat verwijderd uit bron: {bestand} staat al in de doelmap als {nieuwe_naam}", belangrijk=False, niveau='debug', gebeurtenis='duplicaat')
+        return 'duplicaat'
+    balancer = cyclus['balancer']
+    doelmap = balancer.kies(bestand_stat.st_size)
+    if doelmap is None:
+        return 'uitgesteld'
+    gelukt = False
+    try:
+        verplaats_bestand(bron_pad, os.path.join(doelmap, nieuwe_naam), cyclus['journaal'], bestand_stat,
+                          begrenzer=cyclus['bandbreedte'].begrenzer(bronmap, doelmap))
+        gelukt = True
+    finally:
+        balancer.vrijgeven(doelmap, bestand_stat.st_size, gelukt)
+    logboek_bericht(config, f"  Conflict: {bestand} verplaatst als {nieuwe_naam}", belangrijk=False, niveau='debug', gebeurtenis='conflict')
+    return 'verplaatst'
+
+STABIEL_HERCONTROLE_SECONDEN = 60  # Wachttijd tot een nieuwe controle van een bestand dat nog open is
+
+class StabiliteitsControle:
+    """Bepaalt of een bestand klaar is met schrijven, als goedkope aanvulling op minimum_leeftijd_uren.
+    Een bestand is stabiel als grootte en mtime gelijk zijn gebleven tussen twee waarnemingen die
+    minstens stabiel_seconden uit elkaar liggen, of als geen enkel proces het bestand open heeft.
+    De open bestanden worden hooguit één keer per cyclus uit /proc/*/fd gelezen."""
+    
+    def __init__(self, config, index=None):
+        self.lock = threading.Lock()
+        self.waarnemingen = {}  # pad -> (grootte, mtime_ns, tijdstip van de eerste waarneming)
+        self.open_cache = None
+        self.onleesbaar = 0
+        self.stel_in(config)
+        # Waarnemingen van vóór een herstart staan als 'onstabiel' in de index
+        if index is not None and self.seconden > 0:
+            for pad, grootte, mtime_ns, geschikt_vanaf in index.onstabiele_bestanden():
+                self.waarnemingen[pad] = (grootte, mtime_ns, geschikt_vanaf - self.seconden)
+    
+    def stel_in(self, config):
+        """Lees de instellingen (opnieuw) uit de configuratie."""
+        self.seconden = config.get('stabiel_seconden', 0)
+        self.open_controleren = config.get('open_bestanden_controleren', False)
+    
+    def actief(self):
+        """Geef True terug als er een stabiliteitscontrole is ingesteld."""
+        return self.seconden > 0 or self.open_controleren
+    
+    def nieuwe_cyclus(self):
+        """Vergeet de open bestanden van de vorige cyclus."""
+        with self.lock:
+            self.open_cache = None
+            self.onleesbaar = 0
+    
+    def open_bestanden(self):
+        """Geef de (apparaat, inode) van alle gewone bestanden die andere processen open hebben, en of dat
+        overzicht volledig is. Processen waarvan de fd map niet leesbaar is maken het onvolledig."""
+        with self.lock:
+            if self.open_cache is not None:
+                return self.open_cache
+            geopend = set()
+            volledig = True
+            try:
+                pids = [naam for naam in os.listdir('/proc') if naam.isdigit()]
+            except OSError:
+                pids, volledig = [], False
+            eigen_pid = str(os.getpid())
+            for pid in pids:
+                # Onze eigen verplaatsingen tellen niet als schrijver
+                if pid == eigen_pid:
+                    continue
+                fd_map = f"/proc/{pid}/fd"
+                try:
+                    fds = os.listdir(fd_map)
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    volledig = False
+                    self.onleesbaar += 1
+                    continue
+                for fd in fds:
+                    try:
+                        fd_stat = os.stat(os.path.join(fd_map, fd))
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(fd_stat.st_mode):
+                        geopend.add((fd_stat.st_dev, fd_stat.st_ino))
+            self.open_cache = (geopend, volledig)
+            return self.open_cache
+    
+    def is_stabiel(self, pad, bestand_stat, nu):
+        """Geef (stabiel, opnieuw_om) terug; opnieuw_om is het tijdstip voor de volgende controle."""
+        if self.open_controleren:
+            geopend, volledig = self.open_bestanden()
+            # Alleen een volledig overzicht bewijst dat niemand meer schrijft
+            if volledig and (bestand_stat.st_dev, bestand_stat.st_ino) not in geopend:
+                with self.lock:
+                    self.waarnemingen.pop(pad, None)
+                return True, None
+        if self.seconden <= 0:
+            return False, nu + STABIEL_HERCONTROLE_SECONDEN
+        
+        waarneming = (bestand_stat.st_size, bestand_stat.st_mtime_ns)
+        with self.lock:
+            vorige = self.waarnemingen.get(pad)
+            if vorige is not None and vorige[:2] == waarneming:
+                if nu - vorige[2] >= self.seconden:
+                    del self.waarnemingen[pad]
+                    return True, None
+                return False, vorige[2] + self.seconden
+            # Eerste waarneming, of het bestand is sindsdien gewijzigd
+            self.waarnemingen[pad] = waarneming + (nu,)
+        return False, nu + self.seconden
+
+def budget_beschikbaar(cyclus):
+    """Controleer of de tijd van deze cyclus nog niet op is. Na het verlopen worden in deze cyclus
+    geen verplaatsingen meer gestart. De tijd telt hier pas als er iets is gestart, zodat elke cyclus
+    vooruitgang boekt; voor het scannen geldt scan_budget_beschikbaar."""
+    if cyclus['budget_op']:
+        return False
+    if cyclus['budget_deadline'] is not None and cyclus['budget_gestart'] > 0 and time.perf_counter() >= cyclus['budget_deadline']:
+        with cyclus['lock']:
+            if not cyclus['budget_op']:
+                cyclus['budget_op'] = 'tijd'
+        return False
+    return True
+
+def scan_budget_beschikbaar(cyclus):
+    """Controleer of er in deze cyclus nog nieuwe mappen gescand mogen worden. Hier telt de tijd ook als er
+    nog niets is gestart: met een verwerkingsvolgorde start er pas iets na het scannen van alle mappen.
+    De mappen die al worden gescand lopen door, zodat er altijd een kandidaat is om te starten."""
+    if not budget_beschikbaar(cyclus):
+        return False
+    if cyclus['budget_deadline'] is not None and time.perf_counter() >= cyclus['budget_deadline']:
+        cyclus['scan_gestopt'] = True
+        return False
+    return True
+
+def neem_cyclus_budget(cyclus, grootte):
+    """Reserveer grootte bytes van het budget van deze cyclus. Geeft False terug als de tijd of
+    het bytebudget op is. Het eerste bestand van een cyclus past altijd, zodat een bestand dat
+    groter is dan het budget niet eeuwig blijft liggen."""
+    if not budget_beschikbaar(cyclus):
+        return False
+    with cyclus['lock']:
+        if cyclus['budget_op']:
+            return False
+        if cyclus['budget_bytes'] is not None and cyclus['budget_gepland'] > 0 and cyclus['budget_gepland'] + grootte > cyclus['budget_bytes']:
+            cyclus['budget_op'] = 'bytes'
+            return False
+        cyclus['budget_gepland'] += grootte
+        cyclus['budget_gestart'] += 1
+        return True
+
+def plan_scan(config, cyclus, i, bronmap, bestanden=None, map_pad=None, diepte=0):
+    """Geef een (sub)map door aan de scanner pool. De cyclus telt de lopende scans, omdat
+    mappen tijdens het scannen nieuwe submappen aanmelden en de pool daarom niet vooraf weet
+    wanneer alles klaar is."""
+    def scan():
+        try:
+            verwerk_bronmap(config, cyclus, i, bronmap, bestanden, map_pad, diepte)
+        except Exception as e:
+            logboek_bericht(config, f"Fout bij verwerken van bronmap {i+1}: {e}", belangrijk=True, niveau='fout')
+            with cyclus['lock']:
+                cyclus['totaal_fouten'] += 1
+        finally:
+            with cyclus['lock']:
+                cyclus['scans_bezig'] -= 1
+                cyclus['scans_klaar'].notify_all()
+    
+    with cyclus['lock']:
+        cyclus['scans_bezig'] += 1
+    cyclus['scanners'].submit(scan)
+
+def ruim_lege_mappen_op(mappen, bronmappen):
+    """Verwijder lege submappen waaruit bestanden zijn verplaatst, van diep naar ondiep.
+    Bovenliggende mappen die daardoor leeg worden gaan ook weg; de bronmappen zelf blijven staan.
+    Geeft het aantal verwijderde mappen terug."""
+    wortels = {os.path.normpath(pad) for pad in bronmappen if pad}
+    opgeruimd = 0
+    for map_pad in sorted({os.path.normpath(pad) for pad in mappen}, key=lambda pad: pad.count(os.sep), reverse=True):
+        while map_pad not in wortels and os.path.dirname(map_pad) != map_pad:
+            try:
+                os.rmdir(map_pad)
+            except OSError:
+                # Niet leeg of al verwijderd; de bovenliggende mappen worden dan niet leeg
+                break
+            opgeruimd += 1
+            map_pad = os.path.dirname(map_pad)
+    return opgeruimd
+
+# Velden van een stap die in het plan van een droge run komen
+PLAN_VELDEN = ('bestand', 'bron', 'grootte', 'apparaat', 'doelmap', 'doel', 'zelfde_schijf', 'reden')
+
+def verwerk_bronmap(config, cyclus, i, bronmap, bestanden=None, map_pad=None, diepte=0):
+    """Scan één bronmap en geef de verplaatsingen door aan de gedeelde worker pool.
+    Per bronschijf (st_dev) zijn maximaal max_verplaatsingen_per_schijf verplaatsingen tegelijk actief.
+    Elke kandidaat wordt eerst een stap (plan_stap) die daarna door voer_stap_uit wordt uitgevoerd,
+    of in een droge run in het plan wordt vastgelegd.
+    Bij recursief scannen wordt elke submap als eigen taak aan de scanner pool gegeven.
+    Param bestanden: Optionele lijst paden; dan worden alleen deze bestanden opnieuw bekeken
+    Param map_pad: De submap van bronmap die wordt gescand (standaard de bronmap zelf)
+    Param diepte: Diepte van map_pad onder de bronmap"""
+    if map_pad is None:
+        map_pad = bronmap
+    # Relatief pad van deze map onder de bronmap; dat pad blijft onder de doelmap behouden
+    relatieve_map = '' if map_pad == bronmap else os.path.relpath(map_pad, bronmap)
+    recursief = config.get('recursief', False) and bestanden is None
+    max_diepte = config.get('max_diepte', 0)
+    submappen = [] if recursief and (max_diepte <= 0 or diepte < max_diepte) else None
+    doelmappen = cyclus['doelmappen']
+    balancer = cyclus['balancer']
+    deduplicatie = config.get('deduplicatie', False)
+    minimum_leeftijd = config.get('minimum_leeftijd_uren', 12)
+    tijdsgrens = cyclus['tijdsgrens']
+    lock = cyclus['lock']
+    planner = cyclus['planner']
+    index = cyclus['index']
+    coordinatie = cyclus['coordinatie']
+    plan = cyclus['plan']
+    stabiliteit = cyclus['stabiliteit']
+    
+    # Als het budget van de cyclus op is, wordt deze map in een volgende cyclus gescand
+    if not scan_budget_beschikbaar(cyclus):
+        return
+    
+    # Bij verdeling per bronmap scant alleen de instantie die de bronmap toegewezen heeft gekregen
+    if coordinatie is not None and map_pad == bronmap and not coordinatie.is_eigen_bronmap(bronmap):
+        return
+    
+    if not os.path.isdir(map_pad):
+        if map_pad == bronmap:
+            logboek_bericht(config, f"Overslaan van bronmap {i+1}: Map bestaat niet of is geen map.", belangrijk=True, niveau='waarschuwing')
+        return
+    
+    # Een map met dezelfde inode en mtime als bij de vorige scan bevat geen nieuwe bestanden
+    stand = map_stand(map_pad)
+    if index is not None and bestanden is None:
+        if index.map_ongewijzigd(map_pad, stand):
+            if map_pad == bronmap:
+                logboek_bericht(config, f"Map {i+1}: ongewijzigd sinds de vorige scan, overslaan.", belangrijk=False)
+            if submappen is not None:
+                # Wijzigingen dieper in de boom veranderen de mtime van deze map niet; alleen de submappen ophalen
+                scan_teller = maak_scan_teller()
+                for _ in scan_bronmap(map_pad, scan_teller, submappen, bestanden=False):
+                    pass
+                with lock:
+                    for sleutel, waarde in scan_teller.items():
+                        cyclus['scan_teller'][sleutel] += waarde
+                for submap in submappen:
+                    plan_scan(config, cyclus, i, bronmap, None, submap, diepte + 1)
+            return
+        bekend = index.beslissingen(map_pad)
+    else:
+        bekend = {}
+    # Nieuwe beslissingen voor de index: (pad, map, inode, grootte, mtime_ns, beslissing, geschikt_vanaf)
+    index_rijen = []
+    
+    # Groepeer op fysieke schijf zodat een schijf niet door meerdere bronmappen tegelijk overbelast raakt
+    apparaat = os.stat(map_pad).st_dev
+    with lock:
+        if apparaat not in cyclus['schijf_limieten']:
+            cyclus['schijf_limieten'][apparaat] = threading.BoundedSemaphore(cyclus['max_per_schijf'])
+        schijf_limiet = cyclus['schijf_limieten'][apparaat]
+    
+    map_status = {'bestanden': 0, 'verplaatst': 0, 'duplicaten': 0, 'bezig': 0, 'fouten': 0, 'doorgeschoven': 0, 'andere_instantie': 0, 'gepland': 0}
+    # Met een verwerkingsvolgorde worden kandidaten eerst verzameld en na het scannen op prioriteit gestart
+    wachtrij = cyclus['wachtrij']
+    onvolledig = False
+    klaar = threading.Condition(lock)
+    scan_teller = maak_scan_teller()
+    # Tijd per fase in deze scanner; 'wachten' is de tijd die op een vrije worker wordt gewacht
+    fasen = {'scan': 0.0, 'beslis': 0.0, 'wachten': 0.0}
+    
+    def bezet_door_ander(bestand, reden):
+        # Een andere instantie heeft het bestand geclaimd of al verplaatst; de map wordt later opnieuw bekeken
+        if reden == 'bezet':
+            logboek_bericht(config, f"  Overslaan: {bestand} wordt door een andere instantie verwerkt.", belangrijk=False, niveau='debug', gebeurtenis='andere_instantie')
+        with lock:
+            cyclus['totaal_bezet'] += 1
+            map_status['andere_instantie'] += 1
+    
+    def verplaats(stap):
+        bestand, bron_pad, doelmap, bestand_stat = stap['bestand'], stap['bron'], stap['doelmap'], stap['stat']
+        gelukt = False
+        duur = None
+        geclaimd = False
+        try:
+            if coordinatie is not None:
+                reden = coordinatie.neem(bestand, bron_pad, doelmappen)
+                if reden is not None:
+                    bezet_door_ander(bestand, reden)
+                    return
+                geclaimd = True
+            begin = time.perf_counter()
+            verplaats_bestand(bron_pad, stap['doel'], cyclus['journaal'], bestand_stat,
+                              begrenzer=cyclus['bandbreedte'].begrenzer(bronmap, doelmap))
+            duur = time.perf_counter() - begin
+            gelukt = True
+            if len(doelmappen) > 1:
+                logboek_bericht(config, f"  Verplaatst: {bestand} naar {doelmap}", belangrijk=False, niveau='debug', gebeurtenis='verplaatst')
+            else:
+                logboek_bericht(config, f"  Verplaatst: {bestand}", belangrijk=False, niveau='debug', gebeurtenis='verplaatst')
+            with lock:
+                cyclus['totaal_verplaatst'] += 1
+                cyclus['totaal_bytes'] += bestand_stat.st_size
+                cyclus['fasen']['verplaats'] += duur
+                cyclus['latentie_buckets'][bisect.bisect_left(VERPLAATS_LATENTIE_GRENZEN, duur)] += 1
+                map_status['verplaatst'] += 1
+                # Gemeten doorvoer per bronschijf en doelmap, voor de geschatte duur van een droge run
+                meting = cyclus['doorvoer'].setdefault((apparaat, doelmap), [0, 0.0])
+                meting[0] += bestand_stat.st_size
+                meting[1] += duur
+            registreer_eerste_verplaatsing(config)
+        except Exception as e:
+            if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                # Doelmap is vol: niet meer proberen tot er weer ruimte is
+                balancer.markeer_vol(doelmap)
+            logboek_bericht(config, f"  Fout bij verplaatsen van {bestand}: {e}", belangrijk=True, niveau='fout')
+            with lock:
+                cyclus['totaal_fouten'] += 1
+                map_status['fouten'] += 1
+        finally:
+            if geclaimd:
+                coordinatie.vrijgeven(bestand)
+            balancer.vrijgeven(doelmap, bestand_stat.st_size, gelukt, duur)
+            cyclus['totaal_limiet'].release()
+            schijf_limiet.release()
+            with lock:
+                cyclus['gereserveerd'].discard(bestand)
+                map_status['bezig'] -= 1
+                klaar.notify_all()
+    
+    def los_op(stap):
+        bestand, bron_pad, bestand_stat = stap['bestand'], stap['bron'], stap['stat']
+        geclaimd = False
+        try:
+            if coordinatie is not None:
+                # De botsing met de doelmap is hier juist de bedoeling; alleen de claim en de bron tellen
+                reden = coordinatie.neem(bestand, bron_pad)
+                if reden is not None:
+                    bezet_door_ander(bestand, reden)
+                    return
+                geclaimd = True
+            uitkomst = los_botsing_op(config, cyclus, bronmap, bestand, bron_pad, bestand_stat)
+            with lock:
+                if uitkomst == 'duplicaat':
+                    cyclus['totaal_duplicaten'] += 1
+                    map_status['duplicaten'] += 1
+                elif uitkomst == 'verplaatst':
+                    cyclus['totaal_conflicten'] += 1
+                    cyclus['totaal_verplaatst'] += 1
+                    cyclus['totaal_bytes'] += bestand_stat.st_size
+                    map_status['verplaatst'] += 1
+                    registreer_eerste_verplaatsing(config)
+                elif uitkomst == 'bestaat_al':
+                    cyclus['totaal_conflicten'] += 1
+                    index_rijen.append((bron_pad, stap['rij_map'], *stap['sleutel'], 'bestaat_al', None))
+                else:
+                    # Uitgesteld: de map moet de volgende cyclus opnieuw worden gescand
+                    cyclus['totaal_uitgesteld'] += 1
+                    map_status['fouten'] += 1
+        except Exception as e:
+            logboek_bericht(config, f"  Fout bij vergelijken van {bestand} met de doelmap: {e}", belangrijk=True, niveau='fout')
+            with lock:
+                cyclus['totaal_fouten'] += 1
+                map_status['fouten'] += 1
+        finally:
+            if geclaimd:
+                coordinatie.vrijgeven(bestand)
+            cyclus['totaal_limiet'].release()
+            schijf_limiet.release()
+            with lock:
+                map_status['bezig'] -= 1
+                klaar.notify_all()
+    
+    def schuif_door(bestand, bron_pad, botsing):
+        with lock:
+            if not botsing:
+                cyclus['gereserveerd'].discard(bestand)
+            cyclus['totaal_doorgeschoven'] += 1
+            # Zonder opgeslagen mapstand wordt de map de volgende cyclus opnieuw gescand
+            map_status['doorgeschoven'] += 1
+        if bestanden is not None and planner is not None:
+            # Een bestand met een verlopen deadline komt bij de volgende ronde direct weer aan de beurt
+            plan_deadline(planner, time.time(), bron_pad, bronmap)
+    
+    def plan_stap(bestand, bron_pad, bestand_stat, sleutel, rij_map, botsing):
+        """Planningsfase: maak van een kandidaat een stap binnen het budget van de cyclus, met een plek op de
+        bronschijf en in de pool en een gekozen doelmap. Geeft None terug als de kandidaat doorschuift of nergens past.
+        Een stap heeft de velden uit PLAN_VELDEN, plus de stat, indexsleutel en indexmap voor de uitvoering."""
+        # Het budget wordt vóór en na het wachten gecontroleerd, omdat het wachten zelf lang kan duren
+        if not budget_beschikbaar(cyclus):
+            schuif_door(bestand, bron_pad, botsing)
+            return None
         
-        bestanden_in_map = 0
-        verplaatst_in_map = 0
+        # Wacht op een vrije plek op deze schijf en in de pool
+        wacht_begin = time.perf_counter()
+        schijf_limiet.acquire()
+        cyclus['totaal_limiet'].acquire()
+        fasen['wachten'] += time.perf_counter() - wacht_begin
         
-        # Loop door alle bestanden in de bronmap
-        bestanden = [f for f in os.listdir(bronmap) if os.path.isfile(os.path.join(bronmap, f))]
+        if not neem_cyclus_budget(cyclus, bestand_stat.st_size):
+            cyclus['totaal_limiet'].release()
+            schijf_limiet.release()
+            schuif_door(bestand, bron_pad, botsing)
+            return None
+        
+        if botsing:
+            # Een botsing gaat naar de doelmap waarin de naam al bestaat; daar wordt grootte en inhoud vergeleken
+            doelmap = next((doelmap for doelmap in doelmappen if os.path.exists(os.path.join(doelmap, bestand))), None)
+            reden = 'botsing'
+        else:
+            # Kies een doelmap met genoeg vrije ruimte; de ruimte blijft gereserveerd tot de verplaatsing klaar is
+            doelmap = balancer.kies(bestand_stat.st_size)
+            if doelmap is None:
+                cyclus['totaal_limiet'].release()
+                schijf_limiet.release()
+                with lock:
+                    cyclus['gereserveerd'].discard(bestand)
+                    cyclus['totaal_geen_ruimte'] += 1
+                    # Zonder opgeslagen mapstand wordt de map de volgende cyclus opnieuw gescand
+                    map_status['fouten'] += 1
+                return None
+            reden = 'oud_genoeg' if bestanden is None else 'deadline'
         
-        for bestand in bestanden:
-            bron_pad = os.path.join(bronmap, bestand)
-            doel_pad = os.path.join(doelmap, bestand)
+        return {
+            'bestand': bestand,
+            'bron': bron_pad,
+            'grootte': bestand_stat.st_size,
+            'apparaat': apparaat,
+            'doelmap': doelmap,
+            'doel': os.path.join(doelmap, bestand) if doelmap else None,
+            'zelfde_schijf': doelmap is not None and cyclus['doel_apparaten'].get(doelmap) == apparaat,
+            'reden': reden,
+            'stat': bestand_stat,
+            'sleutel': sleutel,
+            'rij_map': rij_map
+        }
+    
+    def voer_stap_uit(stap):
+        """Uitvoerfase: een droge run legt de stap vast in het plan, anders gaat hij naar de worker pool.
+        Elke stap wordt direct na het plannen uitgevoerd, zodat scannen en verplaatsen blijven overlappen."""
+        if plan is not None:
+            # De gereserveerde ruimte blijft staan, zodat het plan de doelmappen net zo vult als een echte cyclus
+            cyclus['totaal_limiet'].release()
+            schijf_limiet.release()
+            with lock:
+                plan.append({veld: stap[veld] for veld in PLAN_VELDEN})
+                map_status['gepland'] += 1
+            return
+        with lock:
+            map_status['bezig'] += 1
+            if stap['reden'] == 'botsing':
+                cyclus['totaal_bestaat_al'] += 1
+        cyclus['pool'].submit(los_op if stap['reden'] == 'botsing' else verplaats, stap)
+    
+    def start(*kandidaat):
+        """Plan één kandidaat en voer de stap uit."""
+        stap = plan_stap(*kandidaat)
+        if stap is not None:
+            voer_stap_uit(stap)
+    
+    # Loop lazy door alle bestanden in de map (geen volledige lijst in het geheugen)
+    if bestanden is None:
+        kandidaten = scan_bronmap(map_pad, scan_teller, submappen)
+    else:
+        kandidaten = scan_bestanden(bestanden, scan_teller)
+    
+    for naam, bron_pad, bestand_stat in meet_iterator(kandidaten, fasen, 'scan'):
+        # Met een verwerkingsvolgorde stopt het scannen ook zodra er na de deadline een kandidaat klaarstaat
+        if not budget_beschikbaar(cyclus) or (wachtrij and not scan_budget_beschikbaar(cyclus)):
+            # De rest van de map schuift door naar de volgende cyclus
+            onvolledig = True
+            break
+        begin = time.perf_counter()
+        try:
+            # Het relatieve pad onder de bronmap is ook het pad onder de doelmap; de index groepeert per map
+            if bestanden is None:
+                bestand = os.path.join(relatieve_map, naam) if relatieve_map else naam
+                rij_map = map_pad
+            else:
+                bestand = os.path.relpath(bron_pad, bronmap)
+                rij_map = os.path.dirname(bron_pad)
             
-            # Controleer de leeftijd van het bestand
-            bestand_tijd = os.path.getmtime(bron_pad)
-            bestand_leeftijd_uren = (time.time() - bestand_tijd) / 3600
+            # Bij verdeling per bestand hoort elke naam bij precies één levende instantie
+            if coordinatie is not None and not coordinatie.is_eigen_bestand(bestand):
+                with lock:
+                    cyclus['totaal_andere_instantie'] += 1
+                    map_status['andere_instantie'] += 1
+                continue
+            
+            # Controleer de leeftijd van het bestand aan de hand van de gecachte stat-gegevens
+            bestand_leeftijd_uren = (time.time() - bestand_stat.st_mtime) / 3600
             
             # Alleen verwerken als het bestand ouder is dan de minimale leeftijd
-            if bestand_leeftijd_uren < minimum_leeftijd:
-                logboek_bericht(config, f"  Overslaan: {bestand} is te nieuw (leeftijd: {bestand_leeftijd_uren:.1f} uur).", belangrijk=False)
-                totaal_overgeslagen_te_nieuw += 1
+            if bestand_stat.st_mtime > tijdsgrens:
+                # Plan het bestand in voor het moment waarop het oud genoeg is; alleen nieuwe bestanden worden gelogd
+                deadline = bestand_stat.st_mtime + minimum_leeftijd * 3600
+                if planner is None or plan_deadline(planner, deadline, bron_pad, bronmap):
+                    logboek_bericht(config, f"  Overslaan: {bestand} is te nieuw (leeftijd: {bestand_leeftijd_uren:.1f} uur).", belangrijk=False, niveau='debug', gebeurtenis='te_nieuw')
+                index_rijen.append((bron_pad, rij_map, bestand_stat.st_ino, bestand_stat.st_size, bestand_stat.st_mtime_ns, 'te_nieuw', deadline))
+                with lock:
+                    cyclus['totaal_overgeslagen_te_nieuw'] += 1
                 continue
-                
-            totaal_bestanden += 1
-            bestanden_in_map += 1
             
-            # Controleer of het bestand al bestaat in de doelmap
-            if os.path.exists(doel_pad):
-                logboek_bericht(config, f"  Overslaan: {bestand} bestaat al in de doelmap.", belangrijk=False)
+            # Een bestand dat nog wordt geschreven wordt opnieuw bekeken zodra het stabiel kan zijn
+            if stabiliteit is not None:
+                stabiel, opnieuw_om = stabiliteit.is_stabiel(bron_pad, bestand_stat, time.time())
+                if not stabiel:
+                    if planner is None or plan_deadline(planner, opnieuw_om, bron_pad, bronmap):
+                        logboek_bericht(config, f"  Overslaan: {bestand} is nog niet stabiel.", belangrijk=False, niveau='debug', gebeurtenis='onstabiel')
+                    index_rijen.append((bron_pad, rij_map, bestand_stat.st_ino, bestand_stat.st_size, bestand_stat.st_mtime_ns, 'onstabiel', opnieuw_om))
+                    with lock:
+                        cyclus['totaal_onstabiel'] += 1
+                    continue
+            
+            # Een ongewijzigd bestand dat eerder al in de doelmap bleek te staan hoeft niet opnieuw bekeken te worden
+            sleutel = (bestand_stat.st_ino, bestand_stat.st_size, bestand_stat.st_mtime_ns)
+            if bekend.get(bron_pad) == sleutel + ('bestaat_al',):
+                index_rijen.append((bron_pad, rij_map, *sleutel, 'bestaat_al', None))
+                with lock:
+                    cyclus['totaal_ongewijzigd'] += 1
                 continue
             
-            try:
-                # Verplaats het bestand
-                shutil.move(bron_pad, doel_pad)
-                logboek_bericht(config, f"  Verplaatst: {bestand}", belangrijk=False)
-                totaal_verplaatst += 1
-                verplaatst_in_map += 1
-            except Exception as e:
-                logboek_bericht(config, f"  Fout bij verplaatsen van {bestand}: {e}", belangrijk=True)
+            # Controleer of het bestand al in een doelmap bestaat of al door een andere worker wordt verplaatst
+            scan_teller['syscalls'] += len(doelmappen)
+            with lock:
+                cyclus['totaal_bestanden'] += 1
+                map_status['bestanden'] += 1
+                bestaat = bestand in cyclus['gereserveerd']
+                if not bestaat:
+                    cyclus['gereserveerd'].add(bestand)
+            in_doelmap = False
+            if not bestaat and bestaat_in_doelmappen(doelmappen, bestand):
+                bestaat = in_doelmap = True
+                with lock:
+                    cyclus['gereserveerd'].discard(bestand)
+            if bestaat and not (in_doelmap and deduplicatie):
+                logboek_bericht(config, f"  Overslaan: {bestand} bestaat al in de doelmap.", belangrijk=False, niveau='debug', gebeurtenis='bestaat_al')
+                with lock:
+                    cyclus['totaal_bestaat_al'] += 1
+                index_rijen.append((bron_pad, rij_map, *sleutel, 'bestaat_al', None))
+                continue
+            
+            kandidaat = (bestand, bron_pad, bestand_stat, sleutel, rij_map, bestaat)
+            if wachtrij is None:
+                start(*kandidaat)
+            else:
+                with lock:
+                    cyclus['volgnummer'] += 1
+                    heapq.heappush(wachtrij, (cyclus['prioriteit'](bestand_stat), cyclus['volgnummer'], start, kandidaat))
+        finally:
+            fasen['beslis'] += time.perf_counter() - begin
+    
+    # Submappen worden door andere scanner threads opgepakt terwijl de verplaatsingen uit deze map lopen
+    for submap in submappen or ():
+        plan_scan(config, cyclus, i, bronmap, None, submap, diepte + 1)
+    
+    def afronden():
+        # Wacht tot alle verplaatsingen uit deze map klaar zijn
+        with lock:
+            klaar.wait_for(lambda: map_status['bezig'] == 0)
+            if map_pad != bronmap and (map_status['verplaatst'] or map_status['duplicaten']):
+                cyclus['geleegde_mappen'].add(map_pad)
+            for sleutel, waarde in scan_teller.items():
+                cyclus['scan_teller'][sleutel] += waarde
+            cyclus['fasen']['scan'] += fasen['scan']
+            # Bij direct starten valt het wachten op een worker binnen de beslis-tijd
+            cyclus['fasen']['beslis'] += fasen['beslis'] - (fasen['wachten'] if wachtrij is None else 0.0)
+            cyclus['fasen']['wachten'] += fasen['wachten']
+        
+        # Werk de index bij; de mapstand van vóór de scan wordt bewaard zodat latere wijzigingen niet worden gemist
+        if index is not None:
+            # 'Bestaat al' in een submap hangt af van die submap in de doelmappen; die wordt aan het eind van de cyclus gevolgd
+            doel_submappen = {os.path.relpath(os.path.dirname(rij[0]), bronmap) for rij in index_rijen
+                              if rij[5] == 'bestaat_al' and rij[1] != bronmap}
+            if doel_submappen:
+                with lock:
+                    cyclus['doel_submappen'].update(doel_submappen)
+            if bestanden is None and not onvolledig:
+                index.vervang_map(map_pad, index_rijen)
+                # Bij fouten, doorgeschoven bestanden of bestanden van andere instanties moet de map de volgende cyclus
+                # opnieuw worden gescand; een andere instantie kan intussen zijn gestopt
+                if map_status['fouten'] == 0 and map_status['doorgeschoven'] == 0 and map_status['andere_instantie'] == 0:
+                    index.zet_map_stand(map_pad, stand)
+            elif bestanden is None:
+                # Niet alle bestanden zijn bekeken; de beslissingen over de rest blijven staan
+                index.vervang_bestanden([rij[0] for rij in index_rijen], index_rijen)
+            else:
+                index.vervang_bestanden(bestanden, index_rijen)
         
         # Toon samenvatting per map alleen als er bestanden zijn verplaatst
-        if bestanden_in_map > 0:
-            logboek_bericht(config, f"Map {i+1}: {verplaatst_in_map} van {bestanden_in_map} bestanden verplaatst uit {bronmap}", belangrijk=(verplaatst_in_map > 0))
+        if plan is not None and map_status['bestanden'] > 0:
+            logboek_bericht(config, f"Map {i+1}: {map_status['gepland']} van {map_status['bestanden']} bestanden gepland uit {map_pad}", belangrijk=False)
+        elif map_status['bestanden'] > 0:
+            logboek_bericht(config, f"Map {i+1}: {map_status['verplaatst']} van {map_status['bestanden']} bestanden verplaatst uit {map_pad}", belangrijk=(map_status['verplaatst'] > 0))
+    
+    if wachtrij is None:
+        afronden()
+    else:
+        # De verplaatsingen starten pas na het scannen van alle mappen; daarna wordt de map afgerond
+        with lock:
+            cyclus['afronden'].append(afronden)
+
+# Bovengrenzen in seconden van de buckets voor de verplaats-latentie histogram
+VERPLAATS_LATENTIE_GRENZEN = (0.001, 0.01, 0.1, 1.0, 10.0, 60.0, 600.0)
+
+def maak_metrics():
+    """Maak de metrics die over cycli heen worden opgeteld (tellers) of per cyclus worden overschreven (laatste_*)."""
+    return {
+        'lock': threading.Lock(),
+        'cycli': 0,
+        'bestanden_gezien': 0,
+        'overgeslagen_te_nieuw': 0,
+        'overgeslagen_bestaat_al': 0,
+        'verplaatst': 0,
+        'bytes_verplaatst': 0,
+        'fouten': 0,
+        'overschrijdingen': 0,
+        'latentie_buckets': [0] * (len(VERPLAATS_LATENTIE_GRENZEN) + 1),
+        'latentie_som': 0.0,
+        'laatste': {}
+    }
+
+def registreer_cyclus(config, metrics, resultaat):
+    """Tel het resultaat van een cyclus op bij de metrics en schrijf het Prometheus bestand."""
+    interval_seconden = config.get('uitvoer_interval_minuten', 10) * 60
+    notifier = get_discord_notifier(config)
+    
+    with metrics['lock']:
+        metrics['cycli'] += 1
+        metrics['bestanden_gezien'] += resultaat['scan_teller']['entries']
+        metrics['overgeslagen_te_nieuw'] += resultaat['overgeslagen_te_nieuw']
+        metrics['overgeslagen_bestaat_al'] += resultaat['overgeslagen_bestaat_al'] + resultaat['ongewijzigd']
+        metrics['verplaatst'] += resultaat['verplaatst']
+        metrics['bytes_verplaatst'] += resultaat['bytes']
+        metrics['fouten'] += resultaat['fouten']
+        for i, aantal in enumerate(resultaat['latentie_buckets']):
+            metrics['latentie_buckets'][i] += aantal
+        metrics['latentie_som'] += resultaat['fasen']['verplaats']
+        
+        # Alleen een volledige cyclus hoort binnen het interval te passen
+        overschrijding = max(0.0, resultaat['duur'] - interval_seconden)
+        if resultaat['soort'] == 'volledig' and overschrijding > 0:
+            metrics['overschrijdingen'] += 1
+        metrics['laatste'] = {
+            'soort': resultaat['soort'],
+            'tijdstip': time.time(),
+            'duur': resultaat['duur'],
+            'scan_duur': resultaat['fasen']['scan'],
+            'bestanden_gezien': resultaat['scan_teller']['entries'],
+            'verplaatst': resultaat['verplaatst'],
+            'bytes': resultaat['bytes'],
+            'fouten': resultaat['fouten'],
+            'overschrijding': overschrijding if resultaat['soort'] == 'volledig' else metrics['laatste'].get('overschrijding', 0.0),
+            'interval': interval_seconden,
+            'discord_wachtrij': notifier.wachtrij_diepte() if notifier is not None else 0,
+            'eerste_verplaatsing': resultaat['eerste_verplaatsing_seconden']
+        }
+    
+    metrics_bestand = naast_configuratie(config.get('metrics_bestand', 'reverseraid.prom'))
+    if metrics_bestand:
+        try:
+            schrijf_metrics_bestand(metrics, metrics_bestand)
+        except OSError as e:
+            logboek_bericht(config, f"Fout bij schrijven van metrics bestand: {e}", belangrijk=False, niveau='waarschuwing')
+
+def formatteer_metrics(metrics):
+    """Zet de metrics om naar het Prometheus tekstformaat."""
+    regels = []
+    
+    def metric(naam, soort, uitleg, waarde, labels=''):
+        regels.append(f"# HELP reverseraid_{naam} {uitleg}")
+        regels.append(f"# TYPE reverseraid_{naam} {soort}")
+        regels.append(f"reverseraid_{naam}{labels} {waarde}")
+    
+    with metrics['lock']:
+        laatste = dict(metrics['laatste'])
+        metric('cycli_totaal', 'counter', "Aantal uitgevoerde cycli.", metrics['cycli'])
+        metric('bestanden_gezien_totaal', 'counter', "Aantal bekeken directory entries.", metrics['bestanden_gezien'])
+        metric('overgeslagen_te_nieuw_totaal', 'counter', "Bestanden overgeslagen omdat ze te nieuw zijn.", metrics['overgeslagen_te_nieuw'])
+        metric('overgeslagen_bestaat_al_totaal', 'counter', "Bestanden overgeslagen omdat ze al in de doelmap staan.", metrics['overgeslagen_bestaat_al'])
+        metric('verplaatst_totaal', 'counter', "Aantal verplaatste bestanden.", metrics['verplaatst'])
+        metric('bytes_verplaatst_totaal', 'counter', "Aantal verplaatste bytes.", metrics['bytes_verplaatst'])
+        metric('fouten_totaal', 'counter', "Aantal fouten bij het verplaatsen.", metrics['fouten'])
+        metric('cyclus_overschrijdingen_totaal', 'counter', "Volledige cycli die langer duurden dan het interval.", metrics['overschrijdingen'])
+        
+        regels.append("# HELP reverseraid_verplaats_duur_seconden Duur van een verplaatsing.")
+        regels.append("# TYPE reverseraid_verplaats_duur_seconden histogram")
+        cumulatief = 0
+        for grens, aantal in zip(list(VERPLAATS_LATENTIE_GRENZEN) + ['+Inf'], metrics['latentie_buckets']):
+            cumulatief += aantal
+            regels.append(f'reverseraid_verplaats_duur_seconden_bucket{{le="{grens}"}} {cumulatief}')
+        regels.append(f"reverseraid_verplaats_duur_seconden_sum {metrics['latentie_som']}")
+        regels.append(f"reverseraid_verplaats_duur_seconden_count {cumulatief}")
+    
+    if laatste:
+        metric('laatste_cyclus_tijdstip_seconden', 'gauge', "Unix tijdstip van het einde van de laatste cyclus.", laatste['tijdstip'])
+        metric('laatste_cyclus_duur_seconden', 'gauge', "Duur van de laatste cyclus.", laatste['duur'], f'{{soort="{laatste["soort"]}"}}')
+        metric('laatste_cyclus_scan_duur_seconden', 'gauge', "Opgetelde scantijd van de laatste cyclus.", laatste['scan_duur'])
+        metric('laatste_cyclus_bestanden_gezien', 'gauge', "Directory entries in de laatste cyclus.", laatste['bestanden_gezien'])
+        metric('laatste_cyclus_verplaatst', 'gauge', "Verplaatste bestanden in de laatste cyclus.", laatste['verplaatst'])
+        metric('laatste_cyclus_bytes_verplaatst', 'gauge', "Verplaatste bytes in de laatste cyclus.", laatste['bytes'])
+        metric('laatste_cyclus_fouten', 'gauge', "Fouten in de laatste cyclus.", laatste['fouten'])
+        metric('cyclus_overschrijding_seconden', 'gauge', "Hoeveel de laatste volledige cyclus over het interval heen ging.", laatste['overschrijding'])
+        metric('interval_seconden', 'gauge', "Geconfigureerd uitvoer interval.", laatste['interval'])
+        metric('discord_wachtrij_diepte', 'gauge', "Aantal Discord berichten in de wachtrij.", laatste['discord_wachtrij'])
+        if laatste['eerste_verplaatsing'] is not None:
+            metric('eerste_verplaatsing_seconden', 'gauge', "Tijd van de start van het proces tot de eerste verplaatsing.", laatste['eerste_verplaatsing'])
+    return "\n".join(regels) + "\n"
+
+def schrijf_metrics_bestand(metrics, pad):
+    """Schrijf de metrics atomisch naar een Prometheus tekstbestand (bijvoorbeeld voor de node_exporter textfile collector)."""
+    tijdelijk = pad + '.tmp'
+    with open(tijdelijk, 'w', encoding='utf-8') as f:
+        f.write(formatteer_metrics(metrics))
+    os.replace(tijdelijk, pad)
+
+def start_metrics_server(config, metrics):
+    """Start een kleine HTTP server op localhost die /metrics serveert. Geeft None terug als hij uit staat."""
+    poort = config.get('metrics_poort', 0)
+    if not poort:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            inhoud = formatteer_metrics(metrics).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(inhoud)))
+            self.end_headers()
+            self.wfile.write(inhoud)
+        
+        def log_message(self, *args):
+            pass
+    
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', poort), MetricsHandler)
+    except OSError as e:
+        logboek_bericht(config, f"Metrics server kan niet starten op poort {poort}: {e}", belangrijk=False)
+        return None
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logboek_bericht(config, f"Metrics beschikbaar op http://127.0.0.1:{poort}/metrics", belangrijk=False)
+    return server
+
+def maak_toestand(config):
+    """Maak de toestand die over cycli heen bewaard blijft (planner, index, journaal, metrics, balancer en hash cache)."""
+    toestand = {
+        # Maar één proces tegelijk mag dit journaal en deze scan index gebruiken
+        'vergrendeling': vergrendel_toestand(config),
+        # Te nieuwe bestanden worden ingepland op het moment dat ze oud genoeg zijn
+        'planner': maak_deadline_planner(),
+        # De scan index onthoudt beslissingen over herstarts heen
+        'index': open_scan_index(config),
+        # Het journaal maakt onderbroken kopieën tussen schijven hervatbaar
+        'journaal': open_verplaats_journaal(config),
+        # Metrics per cyclus voor het Prometheus bestand en de /metrics endpoint
+        'metrics': maak_metrics(),
+        # Verdeling over de doelmappen met vrije ruimte en gemeten doorvoer
+        'balancer': maak_doel_balancer(config),
+        # Bandbreedtelimieten voor kopieën tussen schijven
+        'bandbreedte': Bandbreedte(config),
+        # Leases en claims om het werk met andere instanties te verdelen
+        'coordinatie': maak_coordinatie(config)
+    }
+    # Hashes voor het oplossen van naambotsingen, bewaard in de scan index als die er is
+    toestand['hash_cache'] = HashCache(toestand['index'])
+    # Beslissingen onder andere instellingen (zoals een hogere minimale leeftijd) gelden niet meer
+    if toestand['index'] is not None and toestand['index'].controleer_instellingen(beslis_vingerafdruk(config)):
+        logboek_bericht(config, "Instellingen gewijzigd sinds de vorige scan, scan index wordt opnieuw opgebouwd.", belangrijk=False)
+    # Waarnemingen van bestanden die mogelijk nog worden geschreven
+    toestand['stabiliteit'] = StabiliteitsControle(config, toestand['index'])
+    if toestand['index'] is not None:
+        laad_deadlines_uit_index(toestand['index'], toestand['planner'], config['source_paths'])
+    if toestand['journaal'] is not None:
+        herstel_onderbroken_verplaatsingen(config, toestand['journaal'], toestand['coordinatie'])
+    return toestand
+
+def verplaats_bestanden(config, alleen_mappen=None, alleen_bestanden=None, toestand=None, droog=False):
+    """Verplaats bestanden van bronmappen naar doelmap, parallel per bronschijf.
+    Param alleen_mappen: Optionele verzameling bronmappen; andere bronmappen worden in deze cyclus overgeslagen
+    Param alleen_bestanden: Optionele dict bronmap -> paden; alleen deze bestanden worden opnieuw bekeken
+    Param toestand: Optionele toestand van maak_toestand() die over cycli heen bewaard blijft
+    Param droog: Alleen het plan maken (resultaat['plan']) zonder iets te verplaatsen
+    Geeft een dict met de statistieken van de cyclus terug."""
+    doelmappen = get_doelmappen(config)
+    toestand = toestand or {}
+    index = toestand.get('index')
+    
+    # De balancer blijft over cycli heen bestaan zodat de gemeten doorvoer per doelmap bewaard blijft
+    balancer = toestand.get('balancer')
+    if balancer is None:
+        balancer = maak_doel_balancer(config)
+    else:
+        balancer.stel_doelmappen_in(doelmappen)
+        balancer.beleid = config.get('plaatsingsbeleid', 'meeste_vrije_ruimte')
+        balancer.reserve_bytes = int(config.get('minimale_vrije_ruimte_mb', 1024) * 1024 * 1024)
+    
+    # De bandbreedte buckets blijven bestaan zodat een opgebouwde schuld niet bij elke cyclus verdwijnt
+    bandbreedte = toestand.get('bandbreedte')
+    if bandbreedte is None:
+        bandbreedte = Bandbreedte(config)
+    else:
+        bandbreedte.stel_in(config)
+    
+    # Haal de minimale leeftijd uit de configuratie
+    minimum_leeftijd = config.get('minimum_leeftijd_uren', 12)
+    
+    # Haal de limieten voor gelijktijdige verplaatsingen uit de configuratie
+    max_totaal = max(1, int(config.get('max_verplaatsingen_totaal', 4)))
+    max_per_schijf = max(1, int(config.get('max_verplaatsingen_per_schijf', 1)))
+    
+    # Zorg ervoor dat de doelmappen bestaan
+    if not droog:
+        for doelmap in doelmappen:
+            os.makedirs(doelmap, exist_ok=True)
+    
+    # Lees de vrije ruimte van de doelmappen één keer per cyclus uit
+    balancer.ververs()
+    volle_doelmappen = balancer.volle_doelmappen()
+    if volle_doelmappen:
+        logboek_bericht(config, f"Doelmap(pen) vol, worden overgeslagen tot er weer ruimte is: {', '.join(volle_doelmappen)}", belangrijk=False)
+    
+    # De open bestanden worden per cyclus opnieuw gelezen
+    stabiliteit = toestand.get('stabiliteit')
+    if stabiliteit is not None:
+        stabiliteit.stel_in(config)
+        stabiliteit.nieuwe_cyclus()
+        if not stabiliteit.actief():
+            stabiliteit = None
+    
+    # Lees één keer per cyclus welke instanties leven; het werk van verlopen instanties wordt herverdeeld
+    coordinatie = toestand.get('coordinatie')
+    if coordinatie is not None:
+        verlopen_instanties = coordinatie.ververs()
+        if verlopen_instanties:
+            logboek_bericht(config, f"Lease verlopen van {', '.join(verlopen_instanties)}; hun werk wordt herverdeeld.", belangrijk=True, niveau='waarschuwing')
+    
+    # Na een herladen configuratie gelden beslissingen onder de oude instellingen niet meer
+    if index is not None and index.controleer_instellingen(beslis_vingerafdruk(config)):
+        logboek_bericht(config, "Instellingen gewijzigd sinds de vorige scan, scan index wordt opnieuw opgebouwd.", belangrijk=False)
+    # Als een doelmap buiten ons om is gewijzigd kunnen 'bestaat al' beslissingen niet meer kloppen
+    if index is not None and any([index.controleer_doelmap(doelmap) for doelmap in doelmappen]):
+        logboek_bericht(config, "Doelmap is gewijzigd, scan index wordt opnieuw opgebouwd.", belangrijk=False)
+    
+    # Gedeelde toestand van deze cyclus; alle tellers worden alleen onder de lock bijgewerkt
+    cyclus = {
+        'lock': threading.Lock(),
+        # Bereken de tijdsgrens (minimale leeftijd in uren geleden)
+        'tijdsgrens': time.time() - (minimum_leeftijd * 60 * 60),  # Uren naar seconden
+        'totaal_bestanden': 0,
+        'totaal_verplaatst': 0,
+        'totaal_overgeslagen_te_nieuw': 0,
+        'totaal_ongewijzigd': 0,  # Bestanden die volgens de index al in de doelmap stonden
+        'totaal_bytes': 0,
+        'totaal_bestaat_al': 0,
+        'totaal_fouten': 0,
+        # Aantal verplaatsingen per latentie-bucket (zie VERPLAATS_LATENTIE_GRENZEN, laatste bucket is +Inf)
+        'latentie_buckets': [0] * (len(VERPLAATS_LATENTIE_GRENZEN) + 1),
+        # Opgetelde tijd per fase over alle threads; de log-tijd overlapt met de andere fasen
+        'fasen': {'scan': 0.0, 'beslis': 0.0, 'wachten': 0.0, 'verplaats': 0.0, 'log': 0.0},
+        'totaal_geen_ruimte': 0,
+        'totaal_duplicaten': 0,   # Echte duplicaten die uit de bron zijn verwijderd
+        'totaal_conflicten': 0,   # Botsingen met andere inhoud
+        'totaal_uitgesteld': 0,   # Botsingen uitgesteld omdat het hash-budget op was
+        'hash_budget': int(config.get('hash_budget_mb_per_cyclus', 1024) * 1024 * 1024),
+        'hash_gestart': 0,  # Aantal hashes dat in deze cyclus is berekend
+        'hash_cache': toestand.get('hash_cache') or HashCache(index),
+        'gereserveerd': set(),  # Relatieve paden die in deze cyclus al worden verplaatst
+        'doel_submappen': set(),  # Relatieve submappen waarin 'bestaat al' beslissingen van de doelmap afhangen
+        'geleegde_mappen': set(),  # Submappen waaruit in deze cyclus bestanden zijn verdwenen
+        'scans_bezig': 0,
+        'totaal_doorgeschoven': 0,  # Kandidaten die door het budget naar de volgende cyclus schuiven
+        'totaal_andere_instantie': 0,  # Bestanden die volgens de verdeling bij een andere instantie horen
+        'totaal_bezet': 0,          # Bestanden die al door een andere instantie waren geclaimd of verplaatst
+        'coordinatie': coordinatie,
+        'stabiliteit': stabiliteit,
+        'totaal_onstabiel': 0,  # Oud genoeg, maar mogelijk nog in gebruik
+        # Geplande stappen in een droge run, of None als er echt wordt verplaatst
+        'plan': [] if droog else None,
+        'doel_apparaten': {doelmap: apparaat_van(doelmap) for doelmap in doelmappen},
+        'doorvoer': {},  # (bronschijf, doelmap) -> [bytes, seconden] van de verplaatsingen in deze cyclus
+        'budget_op': False,         # False, 'tijd' of 'bytes'
+        'budget_deadline': None,
+        'budget_bytes': int(config.get('cyclus_max_gb', 0) * 1024 ** 3) or None,
+        'budget_gepland': 0,
+        'budget_gestart': 0,
+        'scan_gestopt': False,      # Het tijdsbudget verliep tijdens het scannen; niet alle mappen zijn bekeken
+        # Prioriteitswachtrij (heap) over de kandidaten van alle mappen, of None bij scanvolgorde
+        'prioriteit': VERWERKINGSVOLGORDES.get(config.get('verwerkingsvolgorde', 'scan')),
+        'wachtrij': None,
+        'volgnummer': 0,
+        'afronden': [],
+        'doelmappen': doelmappen,
+        'balancer': balancer,
+        'bandbreedte': bandbreedte,
+        'max_per_schijf': max_per_schijf,
+        'schijf_limieten': {},
+        'totaal_limiet': threading.BoundedSemaphore(max_totaal),
+        # Tellers om het aantal systeemaanroepen per cyclus te kunnen controleren
+        'scan_teller': maak_scan_teller(),
+        'planner': toestand.get('planner'),
+        'index': index,
+        'journaal': toestand.get('journaal')
+    }
+    cyclus['scans_klaar'] = threading.Condition(cyclus['lock'])
+    if cyclus['prioriteit'] is not None:
+        cyclus['wachtrij'] = []
+    max_scanners = max(1, int(config.get('max_scan_threads', 8)))
+    
+    cyclus_begin = time.perf_counter()
+    bandbreedte_begin = bandbreedte.stand()
+    if config.get('cyclus_max_minuten', 0) > 0:
+        cyclus['budget_deadline'] = cyclus_begin + config['cyclus_max_minuten'] * 60
+    logboek_begin = logboek_statistiek['seconden']
+    
+    if droog:
+        logboek_bericht(config, f"Droge run: plan maken zonder te verplaatsen (alleen bestanden ouder dan {minimum_leeftijd} uur)...", belangrijk=False)
+    elif alleen_bestanden is None:
+        logboek_bericht(config, f"Begin met verplaatsen van bestanden (alleen bestanden ouder dan {minimum_leeftijd} uur)...")
+    else:
+        alleen_mappen = set(alleen_bestanden)
+        aantal = sum(len(paden) for paden in alleen_bestanden.values())
+        logboek_bericht(config, f"Opnieuw bekijken van {aantal} bestand(en) die oud genoeg zijn geworden...", belangrijk=False)
+    
+    # Elke (sub)map wordt door een scanner uit een begrensde pool gescand; de verplaatsingen zelf delen één pool
+    bronmappen = config['source_paths']
+    with ThreadPoolExecutor(max_workers=max_totaal, thread_name_prefix='verplaats') as pool:
+        cyclus['pool'] = pool
+        with ThreadPoolExecutor(max_workers=max_scanners, thread_name_prefix='scan') as scanners:
+            cyclus['scanners'] = scanners
+            for i, bronmap in enumerate(bronmappen):
+                if alleen_mappen is None or bronmap in alleen_mappen:
+                    plan_scan(config, cyclus, i, bronmap, None if alleen_bestanden is None else alleen_bestanden[bronmap])
+            # Submappen worden pas tijdens het scannen aangemeld; wacht tot ook die klaar zijn
+            with cyclus['lock']:
+                cyclus['scans_klaar'].wait_for(lambda: cyclus['scans_bezig'] == 0)
+        
+        # Start de verzamelde kandidaten van alle mappen op volgorde van prioriteit
+        if cyclus['wachtrij'] is not None:
+            while cyclus['wachtrij']:
+                _, _, start, kandidaat = heapq.heappop(cyclus['wachtrij'])
+                start(*kandidaat)
+            for afronden in cyclus['afronden']:
+                try:
+                    afronden()
+                except Exception as e:
+                    logboek_bericht(config, f"Fout bij afronden van een bronmap: {e}", belangrijk=True, niveau='fout')
+                    cyclus['totaal_fouten'] += 1
+    
+    # Ruim submappen op die door het verplaatsen leeg zijn geworden
+    if config.get('lege_mappen_opruimen', False) and cyclus['geleegde_mappen']:
+        opgeruimd = ruim_lege_mappen_op(cyclus['geleegde_mappen'], bronmappen)
+        if opgeruimd:
+            logboek_bericht(config, f"{opgeruimd} lege submap(pen) opgeruimd.", belangrijk=False)
+    
+    totaal_bestanden = cyclus['totaal_bestanden']
+    totaal_verplaatst = cyclus['totaal_verplaatst']
+    scan_teller = cyclus['scan_teller']
+    logboek_bericht(config, f"Scan: {scan_teller['mappen']} mappen, {scan_teller['entries']} entries, {scan_teller['syscalls']} systeemaanroepen, {cyclus['totaal_ongewijzigd']} ongewijzigd volgens de index", belangrijk=False)
+    
+    # Onthoud de stand van de doelmap (en van de gevolgde submappen) na onze eigen verplaatsingen,
+    # zodat alleen externe wijzigingen de index ongeldig maken
+    if index is not None:
+        for doelmap in doelmappen:
+            index.zet_map_stand(doelmap, map_stand(doelmap))
+            gevolgd = {pad for pad, _ in index.doel_submap_standen(doelmap)}
+            gevolgd.update(os.path.join(doelmap, submap) for submap in cyclus['doel_submappen'])
+            for pad in gevolgd:
+                index.zet_map_stand(pad, map_stand(pad))
+    
+    if cyclus['totaal_duplicaten'] or cyclus['totaal_conflicten'] or cyclus['totaal_uitgesteld']:
+        logboek_bericht(config, f"Botsingen: {cyclus['totaal_duplicaten']} duplicaten verwijderd, {cyclus['totaal_conflicten']} conflicten, {cyclus['totaal_uitgesteld']} uitgesteld (hash-budget)", belangrijk=(cyclus['totaal_duplicaten'] + cyclus['totaal_conflicten'] > 0))
+    
+    # Ingestelde en gehaalde kopieersnelheid tussen schijven
+    cyclus_duur = time.perf_counter() - cyclus_begin
+    gekopieerd, gewacht = (nu - begin for nu, begin in zip(bandbreedte.stand(), bandbreedte_begin))
+    gehaald = gekopieerd / cyclus_duur if cyclus_duur > 0 else 0.0
+    ingesteld = bandbreedte.huidige_limiet()
+    if bandbreedte.begrensd() and gekopieerd > 0:
+        limieten = [f"globaal {ingesteld / (1024 * 1024):.1f} MB/s" if ingesteld else "globaal onbeperkt"]
+        if bandbreedte.bronmap_snelheid:
+            limieten.append(f"per bronmap {bandbreedte.bronmap_snelheid / (1024 * 1024):.1f} MB/s")
+        if bandbreedte.doelmap_snelheid:
+            limieten.append(f"per doelmap {bandbreedte.doelmap_snelheid / (1024 * 1024):.1f} MB/s")
+        logboek_bericht(config, f"Bandbreedte: ingesteld {', '.join(limieten)}; gehaald {gehaald / (1024 * 1024):.1f} MB/s over {gekopieerd / (1024 * 1024):.1f} MB, {gewacht:.1f} s wachttijd opgeteld over de workers", belangrijk=False)
+    
+    # Ook zonder doorgeschoven bestanden is de cyclus onvolledig als er mappen niet zijn gescand
+    if cyclus['scan_gestopt'] and not cyclus['budget_op']:
+        cyclus['budget_op'] = 'tijd'
+    if cyclus['budget_op']:
+        reden = "tijdsbudget" if cyclus['budget_op'] == 'tijd' else "bytebudget"
+        logboek_bericht(config, f"Het {reden} van deze cyclus is op: {cyclus['totaal_doorgeschoven']} bestand(en) en eventuele niet gescande mappen schuiven door naar de volgende cyclus.", belangrijk=False)
+    
+    if cyclus['totaal_onstabiel'] > 0:
+        logboek_bericht(config, f"{cyclus['totaal_onstabiel']} bestand(en) nog niet stabiel; ze worden opnieuw bekeken zodra ze stabiel kunnen zijn.", belangrijk=False)
+    if stabiliteit is not None and stabiliteit.open_controleren and stabiliteit.open_cache is not None and not stabiliteit.open_cache[1]:
+        logboek_bericht(config, f"Open bestanden van {stabiliteit.onleesbaar} proces(sen) zijn niet leesbaar; de controle op open bestanden telt daarom niet als bewijs (draai als root of gebruik stabiel_seconden).", belangrijk=False, niveau='waarschuwing')
+    
+    if coordinatie is not None:
+        logboek_bericht(config, f"Coördinatie: {len(coordinatie.instanties)} actieve instantie(s); {cyclus['totaal_andere_instantie']} bestand(en) voor andere instanties, {cyclus['totaal_bezet']} al geclaimd of verplaatst door een andere instantie.", belangrijk=False)
+    
+    # Eén melding per cyclus in plaats van een fout per bestand als alle doelmappen vol zijn
+    if cyclus['totaal_geen_ruimte'] > 0:
+        logboek_bericht(config, f"Onvoldoende vrije ruimte in de doelmappen: {cyclus['totaal_geen_ruimte']} bestand(en) uitgesteld tot een volgende cyclus.", belangrijk=True, niveau='waarschuwing')
+    
+    # Alle verplaatsingen van deze cyclus zijn afgerond; houd het journaal klein
+    if cyclus['journaal'] is not None:
+        cyclus['journaal'].compacteer()
+    
+    # Bewaar de gemeten doorvoer voor de schatting van een latere droge run
+    if index is not None and cyclus['doorvoer']:
+        index.bewaar_doorvoer(cyclus['doorvoer'])
+    
+    # Zet de getelde regels per bestand van deze cyclus in de console vóór het resultaat
+    get_log_pijplijn(config).vat_samen()
     
     # Alleen een resultaatbericht sturen als er daadwerkelijk bestanden zijn verplaatst
-    if totaal_verplaatst > 0 or totaal_bestanden > 0:
-        resultaat_bericht = f"Verplaatsing voltooid: {totaal_verplaatst} van {totaal_bestanden} bestanden verplaatst naar {doelmap}"
+    if droog:
+        logboek_bericht(config, f"Droge run voltooid: {len(cyclus['plan'])} van {totaal_bestanden} bestanden gepland, niets verplaatst.", belangrijk=False)
+    elif totaal_verplaatst > 0 or totaal_bestanden > 0:
+        resultaat_bericht = f"Verplaatsing voltooid: {totaal_verplaatst} van {totaal_bestanden} bestanden verplaatst naar {', '.join(doelmappen)}"
         logboek_bericht(config, resultaat_bericht, belangrijk=True)
     else:
         logboek_bericht(config, "Geen bestanden verplaatst in deze cyclus", belangrijk=False)
+    
+    cyclus['fasen']['log'] = logboek_statistiek['seconden'] - logboek_begin
+    resultaat = {
+        'soort': 'volledig' if alleen_mappen is None else ('deadline' if alleen_bestanden is not None else 'mappen'),
+        'duur': time.perf_counter() - cyclus_begin,
+        'bestanden': totaal_bestanden,
+        'verplaatst': totaal_verplaatst,
+        'overgeslagen_te_nieuw': cyclus['totaal_overgeslagen_te_nieuw'],
+        'overgeslagen_bestaat_al': cyclus['totaal_bestaat_al'],
+        'ongewijzigd': cyclus['totaal_ongewijzigd'],
+        'fouten': cyclus['totaal_fouten'],
+        'geen_ruimte': cyclus['totaal_geen_ruimte'],
+        'duplicaten': cyclus['totaal_duplicaten'],
+        'conflicten': cyclus['totaal_conflicten'],
+        'uitgesteld': cyclus['totaal_uitgesteld'],
+        'onstabiel': cyclus['totaal_onstabiel'],
+        'andere_instantie': cyclus['totaal_andere_instantie'],
+        'bezet': cyclus['totaal_bezet'],
+        'doorgeschoven': cyclus['totaal_doorgeschoven'],
+        'budget_op': cyclus['budget_op'],
+        'bandbreedte_ingesteld': ingesteld,
+        'bandbreedte_gehaald': gehaald,
+        'afgeremd_seconden': gewacht,
+        'bytes': cyclus['totaal_bytes'],
+        'latentie_buckets': list(cyclus['latentie_buckets']),
+        'scan_teller': dict(scan_teller),
+        'fasen': dict(cyclus['fasen']),
+        'eerste_verplaatsing_seconden': opstart['eerste_verplaatsing'],
+        'plan': cyclus['plan']
+    }
+    
+    # Werk de metrics bij en schrijf het Prometheus bestand
+    if toestand.get('metrics') is not None:
+        registreer_cyclus(config, toestand['metrics'], resultaat)
+    return resultaat
 
-def wis_console():
-    """Wis de console op basis van het besturingssysteem."""
-    # Voor Windows
-    if os.name == 'nt':
-        os.system('cls')
-    # Voor Mac en Linux
-    else:
-        os.system('clear')
+# Inotify constanten uit <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASKER = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+INOTIFY_EVENT_KOP = struct.Struct('iIII')
+
+def doorloop_submappen(pad, max_diepte=0, diepte=0):
+    """Geef (submap, diepte) terug voor alle submappen onder pad, tot max_diepte (0 = onbeperkt).
+    Symlinks worden niet gevolgd, net als bij het recursief scannen; onleesbare mappen worden overgeslagen."""
+    if max_diepte > 0 and diepte >= max_diepte:
+        return
+    submappen = []
+    try:
+        for _ in scan_bronmap(pad, submappen=submappen, bestanden=False):
+            pass
+    except OSError:
+        return
+    for submap in submappen:
+        yield submap, diepte + 1
+        yield from doorloop_submappen(submap, max_diepte, diepte + 1)
+
+class InotifyBewaker:
+    """Bewaak bronmappen met inotify via een ctypes binding op libc.
+    Bij recursief scannen krijgt elke submap een eigen watch; events daarin tellen als een wijziging van de bronmap."""
+    
+    def __init__(self, paden, recursief=False, max_diepte=0):
+        import ctypes
+        import ctypes.util
+        self.ctypes = ctypes
+        self.paden = list(paden)
+        self.recursief = recursief
+        self.max_diepte = max_diepte
+        libc_naam = ctypes.util.find_library('c')
+        if not libc_naam:
+            raise OSError("libc niet gevonden")
+        self.libc = ctypes.CDLL(libc_naam, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            fout = ctypes.get_errno()
+            raise OSError(fout, os.strerror(fout))
+        self.masker = INOTIFY_MASKER | (IN_CREATE if recursief else 0)
+        # wd -> (bronmap, gewatchte map, diepte onder de bronmap)
+        self.watches = {}
+        try:
+            for pad in self.paden:
+                if not os.path.isdir(pad):
+                    continue
+                self._voeg_toe(pad, pad, 0)
+                self._voeg_submappen_toe(pad, pad, 0)
+        except Exception:
+            os.close(self.fd)
+            raise
+    
+    def _voeg_toe(self, bronmap, pad, diepte):
+        """Voeg een watch toe voor pad. Geeft een OSError bij een fout, bijvoorbeeld als max_user_watches op is."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(pad), self.masker)
+        if wd < 0:
+            fout = self.ctypes.get_errno()
+            raise OSError(fout, os.strerror(fout), pad)
+        self.watches[wd] = (bronmap, pad, diepte)
+    
+    def _voeg_submappen_toe(self, bronmap, pad, diepte):
+        """Voeg bij recursief scannen watches toe voor alle submappen onder pad."""
+        if not self.recursief:
+            return
+        for submap, submap_diepte in doorloop_submappen(pad, self.max_diepte, diepte):
+            try:
+                self._voeg_toe(bronmap, submap, submap_diepte)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise  # Geen watches meer beschikbaar; dan werkt deze bewaker niet betrouwbaar
+                # De submap is inmiddels verdwenen of niet leesbaar
+    
+    def wacht(self, timeout):
+        """Wacht maximaal timeout seconden op events. Geeft de verzameling gewijzigde mappen terug."""
+        gewijzigd = set()
+        gereed, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        if not gereed:
+            return gewijzigd
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return gewijzigd
+        
+        positie = 0
+        while positie + INOTIFY_EVENT_KOP.size <= len(data):
+            wd, masker, _, naam_lengte = INOTIFY_EVENT_KOP.unpack_from(data, positie)
+            naam = data[positie + INOTIFY_EVENT_KOP.size:positie + INOTIFY_EVENT_KOP.size + naam_lengte].rstrip(b'\0')
+            positie += INOTIFY_EVENT_KOP.size + naam_lengte
+            if masker & IN_Q_OVERFLOW:
+                # Events zijn verloren gegaan; alles opnieuw scannen
+                gewijzigd.update(self.paden)
+            elif wd in self.watches:
+                bronmap, pad, diepte = self.watches[wd]
+                if masker & IN_CREATE and not masker & IN_ISDIR:
+                    continue  # Een nieuw bestand telt pas bij IN_CLOSE_WRITE
+                gewijzigd.add(bronmap)
+                if masker & IN_ISDIR and masker & (IN_CREATE | IN_MOVED_TO) and self.recursief \
+                        and (self.max_diepte <= 0 or diepte < self.max_diepte):
+                    # Nieuwe submap (met eventuele inhoud die er al in staat) ook bewaken
+                    submap = os.path.join(pad, os.fsdecode(naam))
+                    try:
+                        self._voeg_toe(bronmap, submap, diepte + 1)
+                        self._voeg_submappen_toe(bronmap, submap, diepte + 1)
+                    except OSError:
+                        pass  # Verdwenen of geen watches meer; de volgende volledige scan vindt de bestanden alsnog
+                if masker & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.watches.pop(wd, None)
+        return gewijzigd
+    
+    def sluit(self):
+        """Sluit de inotify file descriptor."""
+        os.close(self.fd)
+
+class PollBewaker:
+    """Terugvaloptie zonder inotify: vergelijk periodiek de mtime en inode van de bronmappen.
+    Bij recursief scannen worden ook alle submappen vergeleken."""
+    
+    def __init__(self, paden, poll_interval, recursief=False, max_diepte=0):
+        self.paden = list(paden)
+        self.poll_interval = max(0.1, poll_interval)
+        self.recursief = recursief
+        self.max_diepte = max_diepte
+        self.standen = {pad: self._stand(pad) for pad in self.paden}
+    
+    def _stand(self, pad):
+        try:
+            map_stat = os.stat(pad)
+        except OSError:
+            return None
+        if not self.recursief:
+            return (map_stat.st_ino, map_stat.st_mtime_ns)
+        standen = {pad: (map_stat.st_ino, map_stat.st_mtime_ns)}
+        for submap, _ in doorloop_submappen(pad, self.max_diepte):
+            try:
+                submap_stat = os.stat(submap)
+            except OSError:
+                continue
+            standen[submap] = (submap_stat.st_ino, submap_stat.st_mtime_ns)
+        return standen
+    
+    def wacht(self, timeout):
+        """Poll de bronmappen tot er een wijziging is of de timeout verloopt."""
+        einde = time.monotonic() + max(0, timeout)
+        while True:
+            gewijzigd = set()
+            for pad in self.paden:
+                stand = self._stand(pad)
+                if stand != self.standen[pad]:
+                    self.standen[pad] = stand
+                    gewijzigd.add(pad)
+            resterend = einde - time.monotonic()
+            if gewijzigd or resterend <= 0:
+                return gewijzigd
+            time.sleep(min(self.poll_interval, resterend))
+    
+    def sluit(self):
+        """Niets op te ruimen voor de poll bewaker."""
+
+def maak_map_bewaker(config):
+    """Maak een inotify bewaker voor de bronmappen, met een poll bewaker als terugvaloptie."""
+    paden = [pad for pad in config['source_paths'] if pad]
+    recursief = config.get('recursief', False)
+    max_diepte = config.get('max_diepte', 0)
+    try:
+        return InotifyBewaker(paden, recursief, max_diepte)
+    except (OSError, AttributeError) as e:
+        logboek_bericht(config, f"Inotify niet beschikbaar ({e}), terugvallen op pollen.", belangrijk=False)
+        return PollBewaker(paden, config.get('watch_poll_interval_seconden', 5), recursief, max_diepte)
+
+def wacht_op_werk(bewaker, timeout, bundel_seconden=1.0):
+    """Wacht tot er events zijn in de bronmappen of tot de timeout verloopt.
+    Geeft de gewijzigde mappen terug, of None als de timeout is verlopen (volledige scan nodig)."""
+    gewijzigd = bewaker.wacht(timeout)
+    if not gewijzigd:
+        return None
+    
+    # Bundel events die kort na elkaar binnenkomen tot één scan
+    einde = time.monotonic() + bundel_seconden
+    while True:
+        resterend = einde - time.monotonic()
+        if resterend <= 0:
+            break
+        extra = bewaker.wacht(resterend)
+        if not extra:
+            break
+        gewijzigd |= extra
+    return gewijzigd
 
 def verwerk_bestanden():
     """Hoofdfunctie voor het verwerken van bestanden."""
@@ -434,9 +3446,6 @@ def verwerk_bestanden():
         # Vraag het interval tussen uitvoeringen
         config = vraag_en_update_interval(config)
         
-        # Vraag het interval voor het wissen van de console
-        config = vraag_en_update_console_wissen_interval(config)
-        
         # Vraag de Discord webhook URL
         config = vraag_en_update_discord_webhook(config)
         
@@ -460,56 +3469,299 @@ def verwerk_bestanden():
     
     return config
 
-def main():
-    """Hoofdfunctie die in een lus draait en bestanden verwerkt volgens het geconfigureerde interval."""
-    # Initiële configuratie
-    config = verwerk_bestanden()
+# Exitcodes voor --once en --check, zodat cron en systemd het resultaat kunnen gebruiken
+EXIT_OK = 0          # Cyclus voltooid zonder fouten
+EXIT_FOUTEN = 1      # Een of meer verplaatsingen zijn mislukt
+EXIT_CONFIG = 2      # Configuratie ongeldig of paden ontbreken
+EXIT_ONVOLLEDIG = 3  # Werk is blijven liggen: budget op, geen ruimte of uitgestelde botsingen
+
+def exitcode_voor_resultaat(resultaat):
+    """Vertaal het resultaat van een cyclus naar een exitcode."""
+    if resultaat['fouten'] > 0:
+        return EXIT_FOUTEN
+    if resultaat['budget_op'] or resultaat['geen_ruimte'] > 0 or resultaat['uitgesteld'] > 0:
+        return EXIT_ONVOLLEDIG
+    return EXIT_OK
+
+def lees_argumenten(argv=None):
+    """Lees de opdrachtregel. Zonder modus draait het programma interactief zoals voorheen."""
+    parser = argparse.ArgumentParser(description="Reverse RAID 0 Simulator: verplaats oude bestanden van de bronmappen naar de doelmappen.")
+    parser.add_argument('--config', help="Pad naar het configuratiebestand (standaard reverseraid.yml in de huidige map)")
+    modus = parser.add_mutually_exclusive_group()
+    modus.add_argument('--once', action='store_true', help="Draai één volledige cyclus zonder vragen en stop met een exitcode")
+    modus.add_argument('--daemon', action='store_true', help="Draai doorlopend zonder vragen; stop bij een ongeldige configuratie")
+    modus.add_argument('--check', action='store_true', help="Controleer alleen de configuratie en paden")
+    modus.add_argument('--dry-run', action='store_true', help="Toon wat één cyclus zou verplaatsen, met totale grootte en geschatte duur")
+    parser.add_argument('--plan-bestand', help="Schrijf het plan van --dry-run als JSON naar dit bestand ('-' voor stdout)")
+    return parser.parse_args(argv)
+
+def open_bestaande_index(config):
+    """Open de scan index zonder hem aan te maken als hij nog niet bestaat. Geeft None terug als er geen index is."""
+    pad = get_index_bestand_pad(config)
+    if not config.get('scan_index', True) or not os.path.exists(pad):
+        return None
+    try:
+        return ScanIndex(pad)
+    except sqlite3.Error:
+        return None
+
+def lees_doorvoer(config):
+    """Lees de gemeten doorvoer uit de scan index zonder de index aan te maken als hij nog niet bestaat."""
+    index = open_bestaande_index(config)
+    if index is None:
+        return {}
+    try:
+        return index.haal_doorvoer()
+    finally:
+        index.sluit()
+
+def schat_duur(config, plan, doorvoer):
+    """Schat hoe lang het uitvoeren van een plan duurt op basis van de gemeten doorvoer per bronschijf en doelmap.
+    Bronschijven werken parallel met max_verplaatsingen_per_schijf workers, samen hooguit max_verplaatsingen_totaal;
+    kopieën tussen schijven zijn daarnaast begrensd door bandbreedte_mb_per_seconde.
+    Botsingen en stappen zonder meting tellen mee in onbekend_bytes."""
+    max_totaal = max(1, int(config.get('max_verplaatsingen_totaal', 4)))
+    max_per_schijf = min(max_totaal, max(1, int(config.get('max_verplaatsingen_per_schijf', 1))))
+    schijven = {}
+    tussen_schijven = 0
+    for stap in plan:
+        schijf = schijven.setdefault(stap['apparaat'], {'bestanden': 0, 'bytes': 0, 'seconden': 0.0, 'onbekend_bytes': 0})
+        schijf['bestanden'] += 1
+        schijf['bytes'] += stap['grootte']
+        # Wat er met een botsing gebeurt (vergelijken, hernoemen of niets) is vooraf niet bekend
+        botsing = stap['reden'] == 'botsing'
+        if not stap['zelfde_schijf'] and not botsing:
+            tussen_schijven += stap['grootte']
+        snelheid = None if botsing else doorvoer.get((stap['apparaat'], stap['doelmap']))
+        if snelheid:
+            schijf['seconden'] += stap['grootte'] / snelheid
+        else:
+            schijf['onbekend_bytes'] += stap['grootte']
+    
+    werk = sum(schijf['seconden'] for schijf in schijven.values())
+    seconden = max([schijf['seconden'] / max_per_schijf for schijf in schijven.values()] + [werk / max_totaal])
+    limiet = int(config.get('bandbreedte_mb_per_seconde', 0) * 1024 * 1024)
+    if limiet:
+        seconden = max(seconden, tussen_schijven / limiet)
+    return {
+        'bestanden': len(plan),
+        'bytes': sum(stap['grootte'] for stap in plan),
+        'seconden': seconden,
+        'onbekend_bytes': sum(schijf['onbekend_bytes'] for schijf in schijven.values()),
+        'schijven': {str(apparaat): dict(schijf, seconden=schijf['seconden'] / max_per_schijf) for apparaat, schijf in schijven.items()}
+    }
+
+def formatteer_duur(seconden):
+    """Geef een duur leesbaar terug: in seconden onder de minuut, anders als u:mm:ss."""
+    if seconden < 60:
+        return f"{seconden:.1f} s"
+    return str(timedelta(seconds=round(seconden)))
+
+def toon_plan(plan, schatting):
+    """Print het plan van een droge run met per bronschijf de omvang en de geschatte duur."""
+    for stap in plan:
+        if stap['reden'] == 'botsing':
+            print(f"  {stap['bron']} -> botsing met {stap['doel']} ({stap['grootte'] / (1024 * 1024):.1f} MB)")
+        else:
+            print(f"  {stap['bron']} -> {stap['doel']} ({stap['grootte'] / (1024 * 1024):.1f} MB)")
+    for apparaat, schijf in sorted(schatting['schijven'].items()):
+        print(f"Bronschijf {apparaat}: {schijf['bestanden']} bestanden, {schijf['bytes'] / (1024 * 1024):.1f} MB, "
+              f"geschat {formatteer_duur(schijf['seconden'])}")
+    print(f"Totaal: {schatting['bestanden']} bestanden, {schatting['bytes'] / (1024 * 1024):.1f} MB, "
+          f"geschatte duur {formatteer_duur(schatting['seconden'])}")
+    if schatting['onbekend_bytes']:
+        print(f"Voor {schatting['onbekend_bytes'] / (1024 * 1024):.1f} MB is nog geen doorvoer gemeten (of het zijn botsingen); "
+              f"dat deel zit niet in de schatting.")
+
+def draai_droog(config, plan_bestand=None):
+    """Maak het plan van één volledige cyclus zonder iets te verplaatsen en toon het met een geschatte duur.
+    Zonder index en journaal, zodat een droge run niets op schijf of in de index verandert. De stabiliteitscontrole
+    begint met de waarnemingen uit de index en de coördinatie kijkt alleen naar de leases, zodat het plan
+    dezelfde bestanden overslaat als een echte cyclus van deze instantie."""
+    # Een droge run stuurt geen Discord berichten en schrijft geen logbestand; bij JSON op stdout blijft de console verder stil
+    config = dict(config, discord_webhook_url='', log_bestand='')
+    if plan_bestand == '-':
+        config['console_niveau'] = 'fout'
+    toestand = {'balancer': maak_doel_balancer(config), 'bandbreedte': Bandbreedte(config),
+                'coordinatie': maak_coordinatie(config, alleen_lezen=True)}
+    index = open_bestaande_index(config)
+    try:
+        toestand['stabiliteit'] = StabiliteitsControle(config, index)
+    finally:
+        if index is not None:
+            index.sluit()
+    try:
+        resultaat = verplaats_bestanden(config, toestand=toestand, droog=True)
+    finally:
+        stop_logboek(timeout=5)
+    
+    schatting = schat_duur(config, resultaat['plan'], lees_doorvoer(config))
+    overgeslagen = {'onstabiel': resultaat['onstabiel'], 'andere_instantie': resultaat['andere_instantie']}
+    if plan_bestand:
+        uitvoer = {'plan': resultaat['plan'], 'schatting': schatting, 'overgeslagen': overgeslagen}
+        if plan_bestand == '-':
+            json.dump(uitvoer, sys.stdout, indent=2)
+            print()
+            return EXIT_OK
+        with open(plan_bestand, 'w', encoding='utf-8') as f:
+            json.dump(uitvoer, f, indent=2)
+    toon_plan(resultaat['plan'], schatting)
+    if overgeslagen['onstabiel'] or overgeslagen['andere_instantie']:
+        print(f"Niet in het plan: {overgeslagen['onstabiel']} bestanden nog niet stabiel, "
+              f"{overgeslagen['andere_instantie']} bestanden voor een andere instantie.")
+    return EXIT_OK
+
+def stop_op_signaal(signum, frame):
+    """Behandel SIGTERM als Ctrl+C, zodat wachtrijen en logboek netjes worden geleegd."""
+    raise KeyboardInterrupt
+
+def draai_eenmalig(config):
+    """Draai één volledige cyclus en geef de bijbehorende exitcode terug.
+    Bestanden waarvan de deadline uit de index al is verstreken worden daarna ook bekeken, anders blijven
+    ze in een ongewijzigde map liggen tot een volgende run iets in die map verandert."""
+    toestand = {}
+    try:
+        toestand = maak_toestand(config)
+        resultaat = verplaats_bestanden(config, toestand=toestand)
+        code = exitcode_voor_resultaat(resultaat)
+        verlopen = haal_verlopen_deadlines(toestand['planner'], time.time())
+        if verlopen:
+            resultaat = verplaats_bestanden(config, alleen_bestanden=verlopen, toestand=toestand)
+            # Fouten wegen zwaarder dan blijven liggen werk
+            extra = exitcode_voor_resultaat(resultaat)
+            if code == EXIT_OK or extra == EXIT_FOUTEN:
+                code = extra
+        return code
+    except KeyboardInterrupt:
+        logboek_bericht(config, "Programma gestopt door gebruiker.")
+        return EXIT_ONVOLLEDIG
+    except Exception as e:
+        logboek_bericht(config, f"Fout tijdens uitvoering: {e}", niveau='fout')
+        return EXIT_FOUTEN
+    finally:
+        if toestand.get('coordinatie') is not None:
+            toestand['coordinatie'].stop()
+        stop_discord_notifiers(timeout=config.get('discord_timeout_seconden', DISCORD_TIMEOUT))
+        stop_logboek(timeout=5)
+
+def main(argv=None):
+    """Hoofdfunctie die in een lus draait en bestanden verwerkt volgens het geconfigureerde interval.
+    Met --once, --daemon, --check of --dry-run wordt er niets gevraagd en stopt een ongeldige configuratie direct."""
+    args = lees_argumenten(argv)
+    if args.config:
+        config_cache['pad'] = os.path.abspath(args.config)
+    signal.signal(signal.SIGTERM, stop_op_signaal)
+    
+    if args.plan_bestand and not args.dry_run:
+        print("Fout: --plan-bestand kan alleen samen met --dry-run.", file=sys.stderr)
+        sys.exit(EXIT_CONFIG)
+    
+    if args.once or args.daemon or args.check or args.dry_run:
+        config, fouten = laad_configuratie_zonder_invoer()
+        for fout in fouten:
+            print(f"Fout: {fout}", file=sys.stderr)
+        if fouten:
+            sys.exit(EXIT_CONFIG)
+        if args.check:
+            print(f"Configuratie {get_config_bestand_pad()} is in orde.")
+            sys.exit(EXIT_OK)
+        if args.once:
+            sys.exit(draai_eenmalig(config))
+        if args.dry_run:
+            sys.exit(draai_droog(config, args.plan_bestand))
+    else:
+        # Initiële configuratie
+        config = verwerk_bestanden()
     
     # Haal het interval op
     interval_minuten = config.get('uitvoer_interval_minuten', 10)
-    console_wissen_interval_uren = config.get('console_wissen_interval_uren', 6)
     discord_webhook_url = config.get('discord_webhook_url', '')
     
     discord_status = "ingeschakeld" if discord_webhook_url else "uitgeschakeld"
     logboek_bericht(config, f"Programma draait met een interval van {interval_minuten} minuten. Discord notificaties: {discord_status}.")
-    if console_wissen_interval_uren > 0:
-        logboek_bericht(config, f"De console wordt elke {console_wissen_interval_uren} uur gewist.", belangrijk=False)
+    if config.get('log_bestand', 'reverseraid.log'):
+        logboek_bericht(config, f"Logbestand: {os.path.abspath(naast_configuratie(config['log_bestand']))} (niveau {config.get('log_niveau', 'info')}, console niveau {config.get('console_niveau', 'info')}).", belangrijk=False)
     
     logboek_bericht(config, "Druk Ctrl+C om het programma te stoppen.\n", belangrijk=False)
     
-    # Bijhouden wanneer de console voor het laatst is gewist
-    laatste_console_wis = datetime.now()
+    # In watch modus worden alleen bronmappen met events opnieuw gescand
+    bewaker = maak_map_bewaker(config) if config.get('watch_modus', False) else None
+    te_scannen = None
+    
+    # Planner, scan index en journaal blijven over cycli heen bewaard; onderbroken kopieën worden hier hervat
+    toestand = maak_toestand(config)
+    planner = toestand['planner']
+    metrics_server = start_metrics_server(config, toestand['metrics'])
+    volgende_volledige_scan = 0
     
     try:
         while True:
-            # Controleer of de console moet worden gewist
-            huidige_tijd = datetime.now()
-            if console_wissen_interval_uren > 0 and (huidige_tijd - laatste_console_wis).total_seconds() >= (console_wissen_interval_uren * 3600):
-                wis_console()
-                laatste_console_wis = huidige_tijd
-                logboek_bericht(config, "Console gewist", belangrijk=False)
-                logboek_bericht(config, "Reverse RAID 0 Simulator", belangrijk=False)
+            # Verplaats bestanden: volledig als het interval om is, anders alleen de mappen met events
+            if time.time() >= volgende_volledige_scan:
+                verplaats_bestanden(config, toestand=toestand)
+                volgende_volledige_scan = time.time() + interval_minuten * 60
+            elif te_scannen:
+                verplaats_bestanden(config, te_scannen, toestand=toestand)
+            
+            # Bekijk alleen de bestanden opnieuw waarvan de deadline is verstreken
+            verlopen = haal_verlopen_deadlines(planner, time.time())
+            if verlopen:
+                verplaats_bestanden(config, alleen_bestanden=verlopen, toestand=toestand)
             
-            # Verplaats bestanden
-            verplaats_bestanden(config)
+            # Wacht tot de eerstvolgende deadline of het interval, wat het eerst komt
+            wekmoment = volgende_volledige_scan
+            deadline = volgende_deadline(planner)
+            if deadline is not None:
+                wekmoment = min(wekmoment, deadline)
             
             # Toon wanneer de volgende uitvoering is
-            volgende_uitvoering = datetime.now() + timedelta(minutes=interval_minuten)
+            volgende_uitvoering = datetime.fromtimestamp(wekmoment)
             logboek_bericht(config, f"Volgende run: {volgende_uitvoering.strftime('%H:%M:%S')}", belangrijk=False)
             
-            # Wacht tot het tijd is voor de volgende uitvoering
-            time.sleep(interval_minuten * 60)
+            # Wacht tot het tijd is voor de volgende uitvoering, of tot er events zijn in watch modus
+            if bewaker:
+                te_scannen = wacht_op_werk(bewaker, wekmoment - time.time())
+                if te_scannen:
+                    logboek_bericht(config, f"Wijzigingen gedetecteerd in {len(te_scannen)} bronmap(pen).", belangrijk=False)
+            else:
+                time.sleep(max(0, wekmoment - time.time()))
+            
+            # Werk de configuratie bij als het bestand is gewijzigd; alleen de gewijzigde instellingen worden toegepast
+            nieuwe_config = herlaad_configuratie()
+            if nieuwe_config is not None:
+                gewijzigd = sorted(sleutel for sleutel in set(config) | set(nieuwe_config) if config.get(sleutel) != nieuwe_config.get(sleutel))
+                config = nieuwe_config
+                if gewijzigd:
+                    logboek_bericht(config, f"Configuratie gewijzigd: {', '.join(gewijzigd)}", belangrijk=False)
+                interval_minuten = config.get('uitvoer_interval_minuten', 10)
+                if any(sleutel in BESLIS_INSTELLINGEN for sleutel in gewijzigd):
+                    # Eerdere beslissingen gelden niet meer; de index wordt bij deze volledige scan opnieuw opgebouwd
+                    volgende_volledige_scan = time.time()
+                elif 'uitvoer_interval_minuten' in gewijzigd:
+                    # Het nieuwe interval geldt direct, gerekend vanaf de vorige volledige scan
+                    volgende_volledige_scan = min(volgende_volledige_scan, time.time() + interval_minuten * 60)
             
-            # Werk de configuratie bij voor het geval deze is gewijzigd
-            config, _ = laad_configuratie()
-            interval_minuten = config.get('uitvoer_interval_minuten', 10)
-            console_wissen_interval_uren = config.get('console_wissen_interval_uren', 6)
+            # Bouw de bewaker opnieuw op als de watch modus, de bronmappen of de recursie zijn gewijzigd
+            if bewaker and (not config.get('watch_modus', False) or bewaker.paden != [pad for pad in config['source_paths'] if pad]
+                            or bewaker.recursief != config.get('recursief', False) or bewaker.max_diepte != config.get('max_diepte', 0)):
+                bewaker.sluit()
+                bewaker = None
+                te_scannen = None
+            if not bewaker and config.get('watch_modus', False):
+                bewaker = maak_map_bewaker(config)
             
     except KeyboardInterrupt:
         logboek_bericht(config, "Programma gestopt door gebruiker.")
     except Exception as e:
-        logboek_bericht(config, f"Fout tijdens uitvoering: {e}")
+        logboek_bericht(config, f"Fout tijdens uitvoering: {e}", niveau='fout')
         sys.exit(1)
+    finally:
+        # Geef de lease vrij zodat andere instanties het werk direct overnemen
+        if toestand.get('coordinatie') is not None:
+            toestand['coordinatie'].stop()
+        # Verstuur de laatste berichten en logregels voordat het programma stopt
+        stop_discord_notifiers(timeout=config.get('discord_timeout_seconden', DISCORD_TIMEOUT))
+        stop_logboek(timeout=5)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file